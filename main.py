@@ -117,7 +117,7 @@ def test_game_state():
 
     # Create new game state and load
     new_game = GameState()
-    success = new_game.load_game(f"saves/{game.session_id}.json")
+    success = new_game.load_game(f"saves/{game.session_id}.sav")
 
     if success:
         print(f"Loaded character: {new_game.player.name}")
@@ -168,7 +168,7 @@ def test_dice_system():
     dice = DiceRoller()
 
     # Test some sample rolls
-    test_rolls = ["1d20", "2d6", "1d8+3", "3d6-1"]
+    test_rolls = ["1d20", "2d6", "1d8+3", "3d6-1", "2d6+1d4+3", "4d6dl1", "1d20adv", "1d6!"]
 
     for roll in test_rolls:
         result = dice.roll(roll)
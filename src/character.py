@@ -1,8 +1,88 @@
 import json
+from types import MappingProxyType
+from .content import ABILITIES, DEFAULT_HIT_DIE, load_ruleset
 from .dice import DiceRoller
+from .inventory import EQUIPMENT_SLOTS, Inventory
+
+# Races, classes and skills come from the content packs (see content.py)
+RULESET = load_ruleset()
+
+# Skills and their governing abilities
+SKILL_ABILITIES = RULESET.skills
+SKILLS = tuple(SKILL_ABILITIES)
+
+# Reverse of SKILL_ABILITIES: the skills that need recalculating when an ability changes
+ABILITY_SKILLS = MappingProxyType({
+    ability: tuple(skill for skill, governing in SKILL_ABILITIES.items() if governing == ability)
+    for ability in ABILITIES
+})
+
+RACIAL_BONUSES = RULESET.races
+NO_RACIAL_BONUSES = MappingProxyType({'asi': MappingProxyType({}), 'traits': ()})
+
+CLASS_HIT_DICE = RULESET.hit_dice
+
+# Attributes a snapshot records as they are (in restore order: level resets the proficiency bonus)
+SNAPSHOT_FIELDS = ('name', 'level', 'proficiency_bonus', 'race', 'character_class', 'background',
+                   'alignment', 'hit_points', 'max_hit_points', 'armor_class', 'speed',
+                   'gold', 'silver', 'copper', 'experience_points')
+
+
+class AbilityScores(dict):
+    """Ability score dict that tells its Character which score changed"""
+    _owner = None
+    version = 0  # Goes up with every change, so snapshots know when to take a new copy
+
+    def __init__(self, owner, scores):
+        super().__init__(scores)
+        self._owner = owner
+
+    def __setitem__(self, ability, score):
+        super().__setitem__(ability, score)
+        self.version += 1
+        if self._owner is not None:
+            self._owner._ability_changed(ability)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+        if self._owner is not None:
+            self._owner._invalidate_derived()
+
+    def __reduce__(self):
+        # Scores are restored before the owner is reattached, so copying never notifies a half-built Character
+        return AbilityScores, (None, dict(self)), {'_owner': self._owner}
+
+
+class CharacterSnapshot:
+    """
+    A Character's state at one moment (see Character.snapshot).
+    Abilities and inventory are held as (live object, its version, frozen copy): the frozen
+    copy is shared by every snapshot taken while the live object didn't change.
+    """
+    __slots__ = ('fields', 'skill_proficiencies', 'saving_throw_proficiencies', 'abilities', 'inventory')
+
+    def __init__(self, fields, skill_proficiencies, saving_throw_proficiencies, abilities, inventory):
+        self.fields = fields
+        self.skill_proficiencies = skill_proficiencies
+        self.saving_throw_proficiencies = saving_throw_proficiencies
+        self.abilities = abilities
+        self.inventory = inventory
+
 
 class Character:
-    def __init__(self, name=""):
+    def __init__(self, name="", dice=None):
+        # Lazily filled saving throw / skill bonuses, cleared by the changes that affect them
+        self._saves = {}
+        self._skills = {}
+        self._skill_proficiencies = []
+        self._saving_throw_proficiencies = []
+        self._proficiency_bonus = 2
+
+        # (live object, version, frozen copy) from the last snapshot, reused while unchanged
+        self._snapshot_abilities = None
+        self._snapshot_inventory = None
+
         self.name = name
         self.level = 1
         self.race = ""
@@ -27,39 +107,15 @@ class Character:
         self.proficiency_bonus = 2  # Level 1 starts with +2
         self.speed = 30  # Standard human speed
         
-        # Saving throws (will be modified by proficiencies)
-        self.saving_throws = {
-            'strength': 0,
-            'dexterity': 0,
-            'constitution': 0,
-            'intelligence': 0,
-            'wisdom': 0,
-            'charisma': 0
-        }
-        
-        # Skills (simplified list of key D&D skills)
-        self.skills = {
-            'acrobatics': 0,      # Dex
-            'athletics': 0,       # Str
-            'deception': 0,       # Cha
-            'history': 0,         # Int
-            'insight': 0,         # Wis
-            'intimidation': 0,    # Cha
-            'investigation': 0,   # Int
-            'medicine': 0,        # Wis
-            'perception': 0,      # Wis
-            'persuasion': 0,      # Cha
-            'stealth': 0,         # Dex
-            'survival': 0         # Wis
-        }
-        
+        # Saving throws and skills (see the saving_throws / skills properties) are derived
+        # from abilities and proficiencies on demand
+
         # Proficiencies
         self.skill_proficiencies = []
         self.saving_throw_proficiencies = []
         
-        # Equipment and inventory
-        self.inventory = []
-        self.equipment = {'armor': None, 'weapons': [], 'shield': None}
+        # Equipment and inventory (equipment slots live in the Inventory)
+        self.inventory = Inventory()
         
         # Currency
         self.gold = 0
@@ -69,94 +125,214 @@ class Character:
         # Experience
         self.experience_points = 0
         
-        # Initialize dice roller for character creation
-        self.dice = DiceRoller()
+        # Initialize dice roller for character creation (pass one in to share a seeded stream)
+        self.dice = dice if dice is not None else DiceRoller()
+
+    """-------------"""
+    """Derived Stats"""
+    """-------------"""
+
+    @property
+    def abilities(self):
+        return self._abilities
+
+    @abilities.setter
+    def abilities(self, scores):
+        self._abilities = AbilityScores(self, scores)
+        self._invalidate_derived()
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        self._level = level
+        # 5e proficiency bonus: +2 at levels 1-4, +3 at 5-8, ...
+        self.proficiency_bonus = 2 + (level - 1) // 4
+
+    @property
+    def proficiency_bonus(self):
+        return self._proficiency_bonus
+
+    @proficiency_bonus.setter
+    def proficiency_bonus(self, bonus):
+        if bonus != self._proficiency_bonus:
+            self._proficiency_bonus = bonus
+            self._invalidate_derived()
+
+    @property
+    def skill_proficiencies(self):
+        return self._skill_proficiencies
+
+    @skill_proficiencies.setter
+    def skill_proficiencies(self, skills):
+        self._skill_proficiencies = skills
+        self._skills = {}
+
+    @property
+    def saving_throw_proficiencies(self):
+        return self._saving_throw_proficiencies
+
+    @saving_throw_proficiencies.setter
+    def saving_throw_proficiencies(self, abilities):
+        self._saving_throw_proficiencies = abilities
+        self._saves = {}
+
+    @property
+    def saving_throws(self):
+        """Saving throw bonus per ability (only recalculated when something changed)"""
+        if len(self._saves) != len(ABILITIES):
+            self._saves = {ability: self.calculate_saving_throw(ability) for ability in ABILITIES}
+        return self._saves
+
+    @property
+    def skills(self):
+        """Skill bonus per skill (only recalculated when something changed)"""
+        if len(self._skills) != len(SKILLS):
+            self._skills = {skill: self.calculate_skill(skill) for skill in SKILLS}
+        return self._skills
+
+    def _ability_changed(self, ability):
+        """Drop only the saving throw and skills governed by the changed ability"""
+        self._saves.pop(ability, None)
+        for skill in ABILITY_SKILLS.get(ability, ()):
+            self._skills.pop(skill, None)
 
-    # Inventory management methods
-    def add_to_inventory(self, item): # add item to inventory
-        self.inventory.append(item)
+    def _invalidate_derived(self):
+        self._saves = {}
+        self._skills = {}
 
-    def remove_from_inventory(self, item): # remove item from inventory
-        if item in self.inventory:
-            self.inventory.remove(item)
+    """---------"""
+    """Inventory"""
+    """---------"""
+
+    @property
+    def inventory(self):
+        return self._inventory
+
+    @inventory.setter
+    def inventory(self, items):
+        # Accepts an Inventory, or a saved list of stacks / item names
+        self._inventory = items if isinstance(items, Inventory) else Inventory.from_list(items)
+
+    @property
+    def equipment(self):
+        """Equipped items: {'armor': item, 'weapons': [items], 'shield': item}"""
+        return self._inventory.equipment
+
+    @equipment.setter
+    def equipment(self, equipment):
+        self._inventory.load_equipment(equipment)
+
+    @property
+    def carrying_capacity(self):
+        """Pounds the character can carry (STR score x 15)"""
+        return self.abilities.get('strength', 10) * 15
+
+    @property
+    def is_encumbered(self):
+        return self._inventory.total_weight > self.carrying_capacity
+
+    def add_to_inventory(self, item, quantity=1, weight=None, value=None): # add item to inventory
+        self._inventory.add(item, quantity, weight, value)
+
+    def remove_from_inventory(self, item, quantity=1): # remove item from inventory
+        return self._inventory.remove(item, quantity)
 
     def equip_item(self, item, slot):
         """
         Equip an item to the specified slot.
         slot must be one of "weapons" (list, "armor" (single), or "shield" (single).
         """
-        if item not in self.inventory:
+        if item not in self._inventory:
             print(f"{item} is not in inventory!")
             return False
 
-        if slot == "weapons":
-            self.equipment["weapons"].append(item)
-            return True
-        elif slot in ["armor", "shield"]:
-            self.equipment[slot] = item
-            return True
-        else:
+        if slot not in EQUIPMENT_SLOTS:
             print(f"Invalid equipment slot: {slot}")
             return False
 
+        if not self._inventory.equip(item, slot):
+            print(f"Every {item} you carry is already equipped!")
+            return False
+        return True
+
     def unequip_item(self, item, slot):
         """
         Unequip an item from the specified slot.
         """
-        if slot == "weapons":
-            if slot == "weapons":
-                if item in self.equipment["weapons"]:
-                    self.equipment["weapons"].remove(item)
-                    return True
-            elif slot in ["armor", "shield"]:
-                if self.equipment[slot] == item:
-                    self.equipment[slot] = None
-                    return True
-            print(f"{item} is not equiped in {slot}.")
+        if slot not in EQUIPMENT_SLOTS:
+            print(f"Invalid equipment slot: {slot}")
             return False
-    
+
+        if self._inventory.unequip(item, slot):
+            return True
+        print(f"{item} is not equiped in {slot}.")
+        return False
+
+    """---------"""
+    """Snapshots"""
+    """---------"""
+
+    def snapshot(self):
+        """
+        Record the current state for restore() (e.g. once per turn, for undo).
+        Abilities and inventory are only copied if they changed since the last snapshot,
+        so this usually costs a handful of fields.
+        """
+        abilities = self._snapshot_abilities
+        if abilities is None or abilities[0] is not self._abilities or abilities[1] != self._abilities.version:
+            abilities = self._snapshot_abilities = (
+                self._abilities, self._abilities.version, MappingProxyType(dict(self._abilities))
+            )
+
+        inventory = self._snapshot_inventory
+        if inventory is None or inventory[0] is not self._inventory or inventory[1] != self._inventory.version:
+            inventory = self._snapshot_inventory = (
+                self._inventory, self._inventory.version, self._inventory.copy()
+            )
+
+        return CharacterSnapshot(
+            tuple(getattr(self, field) for field in SNAPSHOT_FIELDS),
+            tuple(self._skill_proficiencies),
+            tuple(self._saving_throw_proficiencies),
+            abilities,
+            inventory
+        )
+
+    def restore(self, snapshot):
+        """Go back to a snapshot, only replacing the parts that changed since it was taken"""
+        for field, value in zip(SNAPSHOT_FIELDS, snapshot.fields):
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+
+        if tuple(self._skill_proficiencies) != snapshot.skill_proficiencies:
+            self.skill_proficiencies = list(snapshot.skill_proficiencies)
+        if tuple(self._saving_throw_proficiencies) != snapshot.saving_throw_proficiencies:
+            self.saving_throw_proficiencies = list(snapshot.saving_throw_proficiencies)
+
+        live, version, frozen = snapshot.abilities
+        if live is not self._abilities or version != self._abilities.version:
+            self.abilities = dict(frozen)
+            self._snapshot_abilities = (self._abilities, self._abilities.version, frozen)
+
+        live, version, frozen = snapshot.inventory
+        if live is not self._inventory or version != self._inventory.version:
+            # The frozen copy stays untouched for other snapshots, so play continues on a copy of it
+            self._inventory = frozen.copy()
+            self._snapshot_inventory = (self._inventory, self._inventory.version, frozen)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, dice=None):
+        """New Character in a snapshot's state (e.g. for a what-if branch)"""
+        character = cls(dice=dice)
+        character.restore(snapshot)
+        return character
+
     def get_racial_bonuses(self):
         """Get ability score increases and traits based on race"""
-        racial_bonuses = {
-            'human': {
-                'asi': {'strength': 1, 'dexterity': 1, 'constitution': 1, 'intelligence': 1, 'wisdom': 1, 'charisma': 1},
-                'traits': ['Extra Language', 'Extra Skill']
-            },
-            'elf': {
-                'asi': {'dexterity': 2},
-                'traits': ['Darkvision', 'Fey Ancestry', 'Trance']
-            },
-            'dwarf': {
-                'asi': {'constitution': 2},
-                'traits': ['Darkvision', 'Dwarven Resilience', 'Stonecunning']
-            },
-            'halfling': {
-                'asi': {'dexterity': 2},
-                'traits': ['Lucky', 'Brave', 'Halfling Nimbleness']
-            },
-            'dragonborn': {
-                'asi': {'strength': 2, 'charisma': 1},
-                'traits': ['Draconic Ancestry', 'Breath Weapon', 'Damage Resistance']
-            },
-            'gnome': {
-                'asi': {'intelligence': 2},
-                'traits': ['Darkvision', 'Gnome Cunning']
-            },
-            'half-elf': {
-                'asi': {'charisma': 2, 'choice': 2},  # +2 Cha, +1 to two different abilities
-                'traits': ['Darkvision', 'Fey Ancestry', 'Extra Skills']
-            },
-            'half-orc': {
-                'asi': {'strength': 2, 'constitution': 1},
-                'traits': ['Darkvision', 'Relentless Endurance', 'Savage Attacks']
-            },
-            'tiefling': {
-                'asi': {'intelligence': 1, 'charisma': 2},
-                'traits': ['Darkvision', 'Hellish Resistance', 'Infernal Legacy']
-            }
-        }
-        
-        return racial_bonuses.get(self.race.lower(), {'asi': {}, 'traits': []})
+        return RACIAL_BONUSES.get(self.race.lower(), NO_RACIAL_BONUSES)
 
     def apply_racial_bonuses(self):
         """Apply racial ability score increases"""
@@ -196,43 +372,36 @@ class Character:
     
     def calculate_saving_throw(self, ability):
         """Calculate saving throw bonus"""
+        cached = self._saves.get(ability)
+        if cached is not None:
+            return cached
+
         base_mod = self.get_ability_modifier(ability)
         proficiency = self.proficiency_bonus if ability in self.saving_throw_proficiencies else 0
-        return base_mod + proficiency
+        bonus = base_mod + proficiency
+        if ability in ABILITIES:
+            self._saves[ability] = bonus
+        return bonus
     
     def calculate_skill(self, skill):
         """Calculate skill bonus"""
-        # Map skills to their governing abilities
-        skill_abilities = {
-            'acrobatics': 'dexterity',
-            'athletics': 'strength',
-            'deception': 'charisma',
-            'history': 'intelligence',
-            'insight': 'wisdom',
-            'intimidation': 'charisma',
-            'investigation': 'intelligence',
-            'medicine': 'wisdom',
-            'perception': 'wisdom',
-            'persuasion': 'charisma',
-            'stealth': 'dexterity',
-            'survival': 'wisdom'
-        }
-        
-        ability = skill_abilities.get(skill, 'intelligence')
+        cached = self._skills.get(skill)
+        if cached is not None:
+            return cached
+
+        ability = SKILL_ABILITIES.get(skill, 'intelligence')
         base_mod = self.get_ability_modifier(ability)
         proficiency = self.proficiency_bonus if skill in self.skill_proficiencies else 0
-        
-        return base_mod + proficiency
+        bonus = base_mod + proficiency
+        if skill in SKILL_ABILITIES:
+            self._skills[skill] = bonus
+        return bonus
     
     def update_derived_stats(self):
         """Update all derived stats after ability scores change"""
-        # Update saving throws
-        for ability in self.saving_throws:
-            self.saving_throws[ability] = self.calculate_saving_throw(ability)
-        
-        # Update skills
-        for skill in self.skills:
-            self.skills[skill] = self.calculate_skill(skill)
+        # Saving throws and skills are recalculated on next use; clearing them here also
+        # picks up changes made behind our back (e.g. appending to skill_proficiencies directly)
+        self._invalidate_derived()
         
         # Update AC (base 10 + dex modifier, will be modified by armor later)
         self.armor_class = 10 + self.get_ability_modifier('dexterity')
@@ -258,26 +427,11 @@ class Character:
         self.update_derived_stats()
     
     def calculate_hp(self):
-        class_hit_dice = {
-            "barbarian": 12,
-            "fighter": 10,
-            "paladin": 10,
-            "ranger": 10,
-            "bard": 8,
-            "cleric": 8,
-            "druid": 8, 
-            "monk": 8, 
-            "rogue": 8,
-            "warlock": 8,
-            "wizard": 8,
-            "sorcerer": 6,
-            # add homebrew/classes as needed
-        }
         con_mod = self.get_ability_modifier('constitution')
-        hd = class_hit_dice.get(self.character_class.lower(), 8) # hit dice
+        hd = CLASS_HIT_DICE.get(self.character_class.lower(), DEFAULT_HIT_DIE) # hit dice
         base_hp = hd # Level 1: max value of hit die
-        self.max_hitpoints = base_hp + con_mod
-        self.hitpoints = self.max_hitpoints
+        self.max_hit_points = base_hp + con_mod
+        self.hit_points = self.max_hit_points
         
         print(f"Hit Points: {self.hit_points}/{self.max_hit_points}")
     
@@ -285,13 +439,13 @@ class Character:
         """Add skill proficiency"""
         if skill not in self.skill_proficiencies:
             self.skill_proficiencies.append(skill)
-            self.skills[skill] = self.calculate_skill(skill)
+            self._skills.pop(skill, None)
     
     def add_saving_throw_proficiency(self, ability):
         """Add saving throw proficiency"""
         if ability not in self.saving_throw_proficiencies:
             self.saving_throw_proficiencies.append(ability)
-            self.saving_throws[ability] = self.calculate_saving_throw(ability)
+            self._saves.pop(ability, None)
     
     def display_character(self):
         """Display character sheet"""
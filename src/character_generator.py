@@ -0,0 +1,121 @@
+from array import array
+from collections import Counter
+from math import sqrt
+
+from .character import ABILITIES, CLASS_HIT_DICE, RACIAL_BONUSES, Character
+from .content import DEFAULT_HIT_DIE
+from .dice import DiceRoller
+
+
+class CharacterBatch:
+    """
+    Level 1 characters stored column-wise in compact arrays, one entry per character.
+    Race and class are stored as indexes into the `races` / `classes` tuples, lowercase as
+    the rules tables key them.
+    """
+    COLUMNS = ABILITIES + ('hit_points', 'armor_class')
+
+    def __init__(self, races, classes, race_index, class_index, abilities, hit_points, armor_class):
+        self.races = races
+        self.classes = classes
+        self.race_index = race_index
+        self.class_index = class_index
+        self.abilities = abilities  # ability -> array of scores
+        self.hit_points = hit_points
+        self.armor_class = armor_class
+
+    def __len__(self):
+        return len(self.race_index)
+
+    def column(self, name):
+        """Array of values for an ability, 'hit_points' or 'armor_class'"""
+        if name in self.abilities:
+            return self.abilities[name]
+        if name in ('hit_points', 'armor_class'):
+            return getattr(self, name)
+        raise KeyError(f"Unknown column: {name}")
+
+    def modifiers(self, ability):
+        """Ability modifiers for every character"""
+        return array('b', [(score - 10) // 2 for score in self.abilities[ability]])
+
+    def indices(self, race=None, character_class=None):
+        """Indexes of characters matching a race and/or class"""
+        race_id = self.races.index(race.lower()) if race else None
+        class_id = self.classes.index(character_class.lower()) if character_class else None
+        return [
+            i for i, (r, c) in enumerate(zip(self.race_index, self.class_index))
+            if (race_id is None or r == race_id) and (class_id is None or c == class_id)
+        ]
+
+    def summary(self, name, indices=None):
+        """Mean, standard deviation, min and max of a column (optionally for a subset)"""
+        values = self.column(name)
+        if indices is not None:
+            values = [values[i] for i in indices]
+        if not values:
+            return {'count': 0, 'mean': 0.0, 'std_dev': 0.0, 'min': None, 'max': None}
+
+        count = len(values)
+        mean = sum(values) / count
+        variance = sum((value - mean) ** 2 for value in values) / count
+        return {
+            'count': count,
+            'mean': mean,
+            'std_dev': sqrt(variance),
+            'min': min(values),
+            'max': max(values)
+        }
+
+    def histogram(self, name, indices=None):
+        """Count of each value in a column, in ascending order"""
+        values = self.column(name)
+        if indices is not None:
+            values = [values[i] for i in indices]
+        return dict(sorted(Counter(values).items()))
+
+    def to_character(self, index, name=""):
+        """Build a full Character for one entry (no console output)"""
+        character = Character(name)
+        character.race = self.races[self.race_index[index]]
+        character.character_class = self.classes[self.class_index[index]]
+        for ability in ABILITIES:
+            character.abilities[ability] = self.abilities[ability][index]
+        character.update_derived_stats()
+        character.max_hit_points = self.hit_points[index]
+        character.hit_points = character.max_hit_points
+        return character
+
+
+def generate_characters(count, races=None, classes=None, dice=None):
+    """
+    Generate `count` level 1 characters without any console output.
+    Uses the same rules as Character: 4d6 drop lowest per ability (in ability order),
+    racial ASI from RACIAL_BONUSES, max hit die + CON modifier for HP and 10 + DEX modifier for AC.
+    Race/class combinations are assigned round-robin so every pairing gets an even share.
+    """
+    races = tuple(race.lower() for race in (races or RACIAL_BONUSES))
+    classes = tuple(character_class.lower() for character_class in (classes or CLASS_HIT_DICE))
+    dice = dice if dice is not None else DiceRoller()
+
+    combinations = [(r, c) for r in range(len(races)) for c in range(len(classes))]
+    # 'H' leaves room for content packs with hundreds of races or classes
+    race_index = array('H', (combinations[i % len(combinations)][0] for i in range(count)))
+    class_index = array('H', (combinations[i % len(combinations)][1] for i in range(count)))
+
+    # One batch for every score; row i holds character i's abilities in ABILITIES order
+    rolls = dice.roll_many("4d6dl1", count * len(ABILITIES))
+
+    abilities = {}
+    for position, ability in enumerate(ABILITIES):
+        bonuses = [RACIAL_BONUSES.get(race, {}).get('asi', {}).get(ability, 0) for race in races]
+        scores = rolls[position::len(ABILITIES)]
+        abilities[ability] = array('b', [score + bonuses[r] for score, r in zip(scores, race_index)])
+
+    hit_dice = [CLASS_HIT_DICE.get(character_class, DEFAULT_HIT_DIE) for character_class in classes]
+    hit_points = array('h', [
+        hit_dice[c] + (con - 10) // 2 for con, c in zip(abilities['constitution'], class_index)
+    ])
+    armor_class = array('b', [10 + (dex - 10) // 2 for dex in abilities['dexterity']])
+
+    return CharacterBatch(races, classes, race_index, class_index, abilities, hit_points, armor_class)
@@ -1,60 +1,392 @@
-from .dice import DiceRoller
+from . import combat_log
+from .dice import DiceRoller, compile_notation
+from .initiative import InitiativeTracker
+from .spatial import SpatialGrid
+
+# Weapon used by characters in simulated fights (longsword, as in main.test_combat_system)
+DEFAULT_WEAPON_DAMAGE = "1d8"
+# Damage used by monster dicts that don't give their own 'damage'
+DEFAULT_MONSTER_DAMAGE = "1d6"
+
+PARTY = 0
+ENEMIES = 1
+
+
+class Combatant:
+    """
+    Flat combat stats for one participant of a simulated fight.
+    Built once per fight so the turn loop never goes through Character methods or dict lookups.
+    """
+    __slots__ = ('name', 'side', 'hit_points', 'max_hit_points', 'armor_class', 'attack_bonus',
+                 'damage', 'damage_modifier', 'dex_modifier', 'source')
+
+    def __init__(self, name, side, hit_points, max_hit_points, armor_class, attack_bonus,
+                 damage, damage_modifier, dex_modifier, source=None):
+        self.name = name
+        self.side = side
+        self.hit_points = hit_points
+        self.max_hit_points = max_hit_points
+        self.armor_class = armor_class
+        self.attack_bonus = attack_bonus
+        self.damage = damage  # Compiled DiceExpression
+        self.damage_modifier = damage_modifier
+        self.dex_modifier = dex_modifier
+        self.source = source
+
+    @classmethod
+    def from_source(cls, source, side):
+        """
+        Build from a monster dict (name, hit_points, armor_class, dex_modifier and optionally
+        attack_bonus, damage, damage_modifier) or from a Character-like object.
+        Current hit points are kept, so a source at 0 HP joins the fight already defeated.
+        """
+        if isinstance(source, dict):
+            hit_points = max(0, source.get('hit_points', 1))
+            return cls(
+                source.get('name', 'Unknown'),
+                side,
+                hit_points,
+                source.get('max_hit_points', hit_points),
+                source.get('armor_class', 10),
+                source.get('attack_bonus', 0),
+                compile_notation(source.get('damage', DEFAULT_MONSTER_DAMAGE)),
+                source.get('damage_modifier', 0),
+                source.get('dex_modifier', 0),
+                source
+            )
+
+        strength_mod = source.get_ability_modifier('strength')
+        if source.max_hit_points > 0:
+            max_hit_points = source.max_hit_points
+            hit_points = max(0, source.hit_points)
+        else:
+            # HP were never calculated (e.g. a bare Character()), so fight at whatever there is, or 1
+            max_hit_points = max(source.hit_points, 1)
+            hit_points = max_hit_points
+        return cls(
+            source.name,
+            side,
+            hit_points,
+            max_hit_points,
+            source.armor_class,
+            strength_mod + source.proficiency_bonus,
+            compile_notation(getattr(source, 'weapon_damage', DEFAULT_WEAPON_DAMAGE)),
+            strength_mod,
+            source.get_ability_modifier('dexterity'),
+            source
+        )
+
+    def stat_block(self):
+        """Plain monster-style dict that from_source turns back into this combatant"""
+        return {
+            'name': self.name,
+            'hit_points': self.hit_points,
+            'max_hit_points': self.max_hit_points,
+            'armor_class': self.armor_class,
+            'attack_bonus': self.attack_bonus,
+            'damage': self.damage.notation,
+            'damage_modifier': self.damage_modifier,
+            'dex_modifier': self.dex_modifier
+        }
+
+
+class EncounterResult:
+    """Compact summary of one simulated fight"""
+    __slots__ = ('rounds', 'winner', 'survivors', 'party_hit_points', 'enemy_hit_points',
+                 'party_damage', 'enemy_damage')
+
+    def __init__(self, rounds, winner, survivors, party_hit_points, enemy_hit_points,
+                 party_damage, enemy_damage):
+        self.rounds = rounds
+        self.winner = winner  # PARTY, ENEMIES or None when max_rounds ran out
+        self.survivors = survivors  # Names of everyone still standing
+        self.party_hit_points = party_hit_points  # HP remaining across the party
+        self.enemy_hit_points = enemy_hit_points
+        self.party_damage = party_damage  # Damage dealt by the party
+        self.enemy_damage = enemy_damage
+
+    @property
+    def party_won(self):
+        return self.winner == PARTY
+
+    @property
+    def total_party_kill(self):
+        return self.winner == ENEMIES
+
+    def to_dict(self):
+        return {
+            'rounds': self.rounds,
+            'winner': {PARTY: 'party', ENEMIES: 'enemies'}.get(self.winner),
+            'survivors': list(self.survivors),
+            'party_hit_points': self.party_hit_points,
+            'enemy_hit_points': self.enemy_hit_points,
+            'party_damage': self.party_damage,
+            'enemy_damage': self.enemy_damage
+        }
+
+
+def _name_of(combatant):
+    """Name of a monster dict or Character-like object"""
+    if isinstance(combatant, dict):
+        return combatant.get('name', 'Unknown')
+    return combatant.name
+
+
+def _armor_class(defender):
+    """AC of a monster dict or Character-like object"""
+    if isinstance(defender, dict):
+        return defender.get('armor_class', 10)
+    return defender.armor_class
+
 
 class CombatSystem:
-    def __init__(self):
-        self.dice = DiceRoller()
+    def __init__(self, dice=None):
+        self.dice = dice if dice is not None else DiceRoller()
+        # Battlefield positions in feet; keyed by id() since monster dicts aren't hashable
+        self.battlefield = SpatialGrid()
+        self._placed = {}
+        # Set to a combat_log.CombatLog to record every roll as a binary event
+        self.event_log = None
+
+    """---------------------"""
+    """Battlefield Positions"""
+    """---------------------"""
+
+    def place(self, combatant, x, y):
+        """Put a combatant on the battlefield at (x, y), or move it there"""
+        self._placed[id(combatant)] = combatant
+        self.battlefield.place(id(combatant), x, y)
+
+    move = place
+
+    def remove_from_battlefield(self, combatant):
+        self._placed.pop(id(combatant), None)
+        self.battlefield.remove(id(combatant))
+
+    def position_of(self, combatant):
+        return self.battlefield.position(id(combatant))
+
+    def creatures_within(self, x, y, radius):
+        """Combatants within `radius` feet of a point (e.g. a fireball's 20 ft radius)"""
+        return [self._placed[key] for key in self.battlefield.within_radius(x, y, radius)]
+
+    def creatures_in_cone(self, origin_x, origin_y, toward_x, toward_y, length):
+        """Combatants in a cone from the origin aimed at a point (e.g. a 15 ft burning hands)"""
+        return [self._placed[key] for key in self.battlefield.in_cone(origin_x, origin_y, toward_x, toward_y, length)]
+
+    def creatures_in_line(self, start_x, start_y, end_x, end_y, width=5):
+        """Combatants in a line area (e.g. a 100 ft lightning bolt)"""
+        return [self._placed[key] for key in self.battlefield.in_line(start_x, start_y, end_x, end_y, width)]
+
+    """----------------"""
+    """Rolls and Fights"""
+    """----------------"""
 
     def roll_initiative(self, characters):
         """Roll initiative for combat participants"""
-        initiative_order = []
+        return self.create_initiative_tracker(characters).order()
+
+    def create_initiative_tracker(self, characters, tracker=None):
+        """
+        Roll initiative for combatants (dicts or Characters) into an InitiativeTracker.
+        Pass an existing tracker to add creatures joining mid-fight.
+        """
+        if tracker is None:
+            tracker = InitiativeTracker()
 
         for character in characters:
-            roll = self.dice.roll("1d20")
-            dex_mod = character.get('dex_modifier', 0)
-            total = roll['final_total'] + dex_mod
-
-            initiative_order.append({
-                'name': character['name'],
-                'initiative': total,
-                'character': character
-            })
-
-        # Sort by initiative (highest first)
-        initiative_order.sort(key=lambda x: x['initiative'], reverse=True)
-        return initiative_order
-    
+            if isinstance(character, dict):
+                dex_mod = character.get('dex_modifier', 0)
+            else:
+                dex_mod = character.get_ability_modifier('dexterity')
+            total = self.dice.roll_total("1d20") + dex_mod
+            entry = tracker.add(character, total, dex_mod)
+            if self.event_log is not None:
+                self.event_log.append(combat_log.INITIATIVE, self.event_log.combatant_id(character, entry.name),
+                                      value=total, detail=dex_mod)
+
+        return tracker
+
     def make_attack_roll(self, attacker, defender, weapon_type="melee"):
-        """Make an attack roll"""
-        attack_roll = self.dice.roll("1d20")
+        """Make an attack roll (natural 20 always hits and crits, natural 1 always misses)"""
+        attack_roll = self.dice.roll_total("1d20")
 
         # Determine ability modifier based on weapon type
         if weapon_type == "melee":
             ability_mod = attacker.get_ability_modifier('strength')
         else: # ranged
             ability_mod = attacker.get_ability_modifier('dexterity')
-        
+
         proficiency = attacker.proficiency_bonus
-        total_attack = attack_roll['final_total'] + ability_mod + proficiency
-        
-        target_ac = defender.get('armor_class', 10)
-        hit = total_attack >= target_ac
+        total_attack = attack_roll + ability_mod + proficiency
+
+        target_ac = _armor_class(defender)
+        critical = attack_roll == 20
+        hit = critical or (attack_roll != 1 and total_attack >= target_ac)
+
+        events = self.event_log
+        if events is not None:
+            events.append(combat_log.ATTACK, events.combatant_id(attacker, _name_of(attacker)),
+                          events.combatant_id(defender, _name_of(defender)),
+                          total_attack, target_ac, flags=(combat_log.HIT if hit else 0) | (combat_log.CRITICAL if critical else 0))
 
         return {
-            'attack_roll': attack_roll['final_total'],
+            'attack_roll': attack_roll,
             'ability_modifier': ability_mod,
             'proficiency_bonus': proficiency,
             'total': total_attack,
             'target_ac': target_ac,
-            'hit': hit
+            'hit': hit,
+            'critical': critical
         }
-    
-    def roll_damage(self, weapon_damage, ability_modifier):
-        """Roll damage for a weapon"""
-        damage_roll = self.dice.roll(weapon_damage)
-        total_damage = damage_roll['final_total'] + ability_modifier
+
+    def roll_damage(self, weapon_damage, ability_modifier, critical=False, attacker=None, target=None):
+        """
+        Roll damage for a weapon (critical hits roll the damage dice twice).
+        attacker/target are only used to label the event log entry.
+        """
+        damage_roll = self.dice.roll_total(weapon_damage)
+        if critical:
+            expression = compile_notation(weapon_damage)
+            damage_roll += expression.total(self.dice.rng) - expression.modifier
+        total_damage = damage_roll + ability_modifier
+
+        events = self.event_log
+        if events is not None:
+            events.append(combat_log.DAMAGE,
+                          events.combatant_id(attacker, _name_of(attacker)) if attacker is not None else combat_log.NO_ONE,
+                          events.combatant_id(target, _name_of(target)) if target is not None else combat_log.NO_ONE,
+                          max(1, total_damage), -1)
 
         return {
-            'damage_roll': damage_roll['final_total'],
+            'damage_roll': damage_roll,
             'ability_modifier': ability_modifier,
             'total_damage': max(1, total_damage) # Minimum 1 damage
-        }
\ No newline at end of file
+        }
+
+    def run_encounter(self, party, enemies, max_rounds=100, log=None):
+        """
+        Run a full fight without any input or printing and return an EncounterResult.
+        Everyone acts in initiative order (ties go to the higher DEX modifier) and attacks the
+        opposing combatant with the fewest hit points left. The fight ends when a side is down
+        or after max_rounds. Pass log=print to narrate the fight.
+        The Characters and dicts passed in are not modified.
+        """
+        rng = self.dice.rng
+        rand = rng.random
+        combatants = [Combatant.from_source(member, PARTY) for member in party]
+        combatants += [Combatant.from_source(enemy, ENEMIES) for enemy in enemies]
+        sides = (
+            [c for c in combatants if c.side == PARTY],
+            [c for c in combatants if c.side == ENEMIES]
+        )
+        alive = [sum(1 for c in side if c.hit_points > 0) for side in sides]
+        damage_dealt = [0, 0]
+
+        # Initiative: d20 + DEX, ties broken by DEX modifier then by order given
+        rolled = [(int(rand() * 20) + 1 + c.dex_modifier, c.dex_modifier, -i, c) for i, c in enumerate(combatants)]
+        rolled.sort(key=lambda entry: entry[:3], reverse=True)
+        order = [entry[3] for entry in rolled]
+        if log:
+            log("Initiative: " + ", ".join(f"{c.name} ({initiative})" for initiative, _, _, c in rolled))
+
+        events = self.event_log
+        if events is not None:
+            # One id per combatant for this encounter (registered after ENCOUNTER_START, which starts them over)
+            events.append(combat_log.ENCOUNTER_START, value=len(combatants))
+            log_ids = {}
+            occurrences = {}
+            for c in combatants:
+                occurrence = occurrences.get(id(c.source), 0)
+                occurrences[id(c.source)] = occurrence + 1
+                log_ids[id(c)] = events.combatant_id(c.source, c.name, occurrence)
+            for initiative, dex_mod, _, c in rolled:
+                events.append(combat_log.INITIATIVE, log_ids[id(c)], value=initiative, detail=dex_mod)
+
+        winner = None
+        if not alive[ENEMIES]:
+            winner = PARTY
+        elif not alive[PARTY]:
+            winner = ENEMIES
+        rounds = 0
+        while rounds < max_rounds and winner is None:
+            rounds += 1
+            if log:
+                log(f"--- Round {rounds} ---")
+
+            for actor in order:
+                if actor.hit_points <= 0:
+                    continue
+
+                opponents = sides[1 - actor.side]
+                target = None
+                for candidate in opponents:
+                    if candidate.hit_points > 0 and (target is None or candidate.hit_points < target.hit_points):
+                        target = candidate
+
+                d20 = int(rand() * 20) + 1
+                critical = d20 == 20
+                hit = critical or (d20 != 1 and d20 + actor.attack_bonus >= target.armor_class)
+                if events is not None:
+                    events.append(combat_log.ATTACK, log_ids[id(actor)], log_ids[id(target)],
+                                  d20 + actor.attack_bonus, target.armor_class, rounds,
+                                  (combat_log.HIT if hit else 0) | (combat_log.CRITICAL if critical else 0))
+                if not hit:
+                    if log:
+                        log(f"{actor.name} attacks {target.name} ({d20 + actor.attack_bonus} vs AC {target.armor_class}) and misses")
+                    continue
+
+                damage_expression = actor.damage
+                damage = damage_expression.total(rng) + actor.damage_modifier
+                if critical:
+                    damage += damage_expression.total(rng) - damage_expression.modifier
+                damage = max(1, damage)
+
+                target.hit_points = max(0, target.hit_points - damage)
+                damage_dealt[actor.side] += damage
+                if events is not None:
+                    events.append(combat_log.DAMAGE, log_ids[id(actor)], log_ids[id(target)],
+                                  damage, target.hit_points, rounds)
+                if log:
+                    log(f"{actor.name} {'CRITS' if critical else 'hits'} {target.name} for {damage} "
+                        f"({target.hit_points}/{target.max_hit_points} HP left)")
+
+                if target.hit_points == 0:
+                    alive[target.side] -= 1
+                    if events is not None:
+                        events.append(combat_log.DEFEATED, target=log_ids[id(target)], round_number=rounds)
+                    if log:
+                        log(f"{target.name} falls!")
+                    if alive[target.side] == 0:
+                        winner = actor.side
+                        break
+
+        result = EncounterResult(
+            rounds,
+            winner,
+            tuple(c.name for c in combatants if c.hit_points > 0),
+            sum(c.hit_points for c in sides[PARTY]),
+            sum(c.hit_points for c in sides[ENEMIES]),
+            damage_dealt[PARTY],
+            damage_dealt[ENEMIES]
+        )
+        if events is not None:
+            events.append(combat_log.ENCOUNTER_END, value=-1 if winner is None else winner, round_number=rounds)
+        if log:
+            outcome = {PARTY: "The party wins", ENEMIES: "The party has fallen"}.get(winner, "The fight is undecided")
+            log(f"{outcome} after {rounds} round(s).")
+        return result
+
+    def start_combat(self, player, enemies=None):
+        """Run a narrated debug fight between the player and a goblin (or the given enemies)"""
+        if enemies is None:
+            enemies = [{
+                'name': 'Goblin',
+                'armor_class': 15,
+                'hit_points': 7,
+                'dex_modifier': 2,
+                'attack_bonus': 4,
+                'damage': '1d6',
+                'damage_modifier': 2
+            }]
+        return self.run_encounter([player], enemies, log=print)
@@ -0,0 +1,265 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+# Every event is one fixed-size little-endian record:
+# type, flags, round, actor id, target id, value, detail
+RECORD = struct.Struct('<BBHIIii')
+RECORD_SIZE = RECORD.size
+
+# Event types
+ENCOUNTER_START = 1  # value: number of combatants
+INITIATIVE = 2  # actor, value: initiative total, detail: DEX modifier
+ATTACK = 3  # actor, target, value: attack total, detail: target AC, flags: HIT/CRITICAL
+DAMAGE = 4  # actor, target, value: damage dealt, detail: target HP left (-1 if unknown)
+DEFEATED = 5  # target
+ENCOUNTER_END = 6  # round: rounds fought, value: winning side (-1 for none)
+
+EVENT_NAMES = {
+    ENCOUNTER_START: 'encounter_start',
+    INITIATIVE: 'initiative',
+    ATTACK: 'attack',
+    DAMAGE: 'damage',
+    DEFEATED: 'defeated',
+    ENCOUNTER_END: 'encounter_end'
+}
+
+# Flags
+HIT = 1
+CRITICAL = 2
+
+# Id 0 means "nobody"
+NO_ONE = 0
+
+# Buffered bytes before the writer flushes to disk
+FLUSH_THRESHOLD = 64 * 1024
+
+CombatEvent = namedtuple('CombatEvent', 'type flags round actor target value detail')
+
+
+def _names_path(path):
+    """Combatant names live next to the log, one per line (line n is id n)"""
+    return path + ".names"
+
+
+class CombatLog:
+    """
+    Append-only log of combat events as fixed-size binary records.
+    Combatants are interned to integer ids so every record stays the same size; within an
+    encounter each combatant gets its own id, labelled "Goblin", "Goblin#2"... when names
+    repeat. Labels (and so ids) are reused by later encounters, so the names file only grows
+    with the largest group of same-named combatants.
+    With no path the log is kept in memory (see `data`).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._buffer = bytearray()
+        self._names = {}
+        # Combatants of the current encounter, cleared when an encounter starts or ends
+        self._combatants = {}  # (id(combatant), occurrence) -> (combatant, log id)
+        self._labels = set()
+        self._label_counts = {}  # name -> last "#n" suffix used
+        self._names_file = None
+        self._file = None
+        self.count = 0
+
+        if path:
+            self._load_names(_names_path(path))
+            # A crash mid-write can leave a partial record; cut it off so new records stay aligned
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            self.count = size // RECORD_SIZE
+            if size != self.count * RECORD_SIZE:
+                os.truncate(path, self.count * RECORD_SIZE)
+            self._file = open(path, 'ab')
+            self._names_file = open(_names_path(path), 'a', encoding='utf-8')
+
+    def _load_names(self, names_path):
+        if not os.path.exists(names_path):
+            return
+        with open(names_path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        # The last line is empty unless a crash tore it, and a torn name is dropped
+        if lines[-1]:
+            with open(names_path, 'w', encoding='utf-8') as f:
+                f.write(''.join(line + '\n' for line in lines[:-1]))
+        for index, line in enumerate(lines[:-1], start=1):
+            self._names[line] = index
+
+    @property
+    def data(self):
+        """Raw bytes of an in-memory log"""
+        return bytes(self._buffer)
+
+    def name_id(self, name):
+        """Integer id for a name, registering it the first time (every use of the name shares it)"""
+        name_id = self._names.get(name)
+        if name_id is None:
+            name_id = self._register(name)
+        return name_id
+
+    def combatant_id(self, combatant, name, occurrence=0):
+        """
+        Integer id for one combatant (a Character, NPC or monster dict) in the current encounter.
+        Combatants sharing a name get labels like "Goblin#2". When the same object fights more than
+        once in an encounter (e.g. [goblin] * 3), occurrence tells the copies apart.
+        """
+        key = (id(combatant), occurrence)
+        entry = self._combatants.get(key)
+        if entry is not None and entry[0] is combatant:
+            return entry[1]
+
+        name = str(name).replace('\n', ' ')
+        number = self._label_counts.get(name, 0)
+        label = name if number == 0 else f"{name}#{number + 1}"
+        while label in self._labels:  # Only when a name itself looks like "Goblin#2"
+            number += 1
+            label = f"{name}#{number + 1}"
+        self._label_counts[name] = number + 1
+        self._labels.add(label)
+
+        combatant_id = self.name_id(label)
+        # Holding the combatant (until the encounter ends) keeps its id() from being reused
+        self._combatants[key] = (combatant, combatant_id)
+        return combatant_id
+
+    def _end_encounter(self):
+        self._combatants.clear()
+        self._labels.clear()
+        self._label_counts.clear()
+
+    def _register(self, name):
+        name = str(name).replace('\n', ' ')
+        name_id = len(self._names) + 1
+        self._names[name] = name_id
+        if self._names_file:
+            self._names_file.write(name + '\n')
+            self._names_file.flush()
+        return name_id
+
+    def names(self):
+        """Names in id order (index 0 is id 1)"""
+        return list(self._names)
+
+    def append(self, event_type, actor=NO_ONE, target=NO_ONE, value=0, detail=0, round_number=0, flags=0):
+        if event_type == ENCOUNTER_START or event_type == ENCOUNTER_END:
+            self._end_encounter()
+        self._buffer += RECORD.pack(event_type, flags, round_number, actor, target, value, detail)
+        self.count += 1
+        if self._file and len(self._buffer) >= FLUSH_THRESHOLD:
+            self.flush()
+
+    def flush(self):
+        if self._file:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._buffer.clear()
+
+    def close(self):
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._names_file.close()
+            self._file = None
+            self._names_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CombatLogReader:
+    """
+    Random-access reader for a combat log file (or the bytes of an in-memory log).
+    The file is memory-mapped, so seeking to event n is a single offset calculation.
+    """
+
+    def __init__(self, source, names=None):
+        self._mmap = None
+        if isinstance(source, (bytes, bytearray)):
+            self._view = memoryview(bytes(source))
+        else:
+            with open(source, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap) if self._mmap else memoryview(b'')
+            if names is None and os.path.exists(_names_path(source)):
+                with open(_names_path(source), 'r', encoding='utf-8') as f:
+                    names = [line.rstrip('\n') for line in f]
+
+        self._names = list(names or [])
+        # Ignore a trailing partial record (e.g. from a crash mid-write)
+        self._length = len(self._view) // RECORD_SIZE
+        self._view = self._view[:self._length * RECORD_SIZE]
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("combat log index out of range")
+        return CombatEvent(*RECORD.unpack_from(self._view, index * RECORD_SIZE))
+
+    def __iter__(self):
+        return map(CombatEvent._make, RECORD.iter_unpack(self._view))
+
+    def events(self, start=0, stop=None, event_types=None):
+        """Events from index start to stop, optionally only some event types"""
+        stop = self._length if stop is None else min(stop, self._length)
+        window = self._view[start * RECORD_SIZE:stop * RECORD_SIZE]
+        for record in RECORD.iter_unpack(window):
+            if event_types is None or record[0] in event_types:
+                yield CombatEvent._make(record)
+
+    def replay(self, handler, start=0, stop=None, event_types=None):
+        """Call handler(event) for every event in order"""
+        for event in self.events(start, stop, event_types):
+            handler(event)
+
+    def encounters(self):
+        """(start, end) index pairs of each encounter, end being its ENCOUNTER_END event"""
+        spans = []
+        start = None
+        for index, record in enumerate(RECORD.iter_unpack(self._view)):
+            if record[0] == ENCOUNTER_START:
+                start = index
+            elif record[0] == ENCOUNTER_END and start is not None:
+                spans.append((start, index))
+                start = None
+        return spans
+
+    def name(self, name_id):
+        """Combatant name for an id"""
+        if 0 < name_id <= len(self._names):
+            return self._names[name_id - 1]
+        return None
+
+    def describe(self, event):
+        """Readable one-line description of an event"""
+        actor = self.name(event.actor)
+        target = self.name(event.target)
+        if event.type == INITIATIVE:
+            return f"{actor} rolls {event.value} for initiative"
+        if event.type == ATTACK:
+            outcome = "CRITS" if event.flags & CRITICAL else "hits" if event.flags & HIT else "misses"
+            return f"{actor} attacks {target} ({event.value} vs AC {event.detail}) and {outcome}"
+        if event.type == DAMAGE:
+            return f"{actor} deals {event.value} damage to {target}"
+        if event.type == DEFEATED:
+            return f"{target} falls"
+        if event.type == ENCOUNTER_START:
+            return f"Encounter starts with {event.value} combatants"
+        if event.type == ENCOUNTER_END:
+            return f"Encounter ends after {event.round} round(s)"
+        return f"Unknown event {event.type}"
+
+    def close(self):
+        self._view.release()
+        if self._mmap:
+            self._mmap.close()
+            self._mmap = None
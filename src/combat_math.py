@@ -0,0 +1,110 @@
+from functools import lru_cache
+
+from .combat import ENEMIES, PARTY, Combatant
+from .dice import compile_notation
+from .probability import DiceDistribution, distribution, mixture
+
+# Armor classes covered by dpr_table when no range is given
+DEFAULT_AC_RANGE = range(10, 26)
+
+
+@lru_cache(maxsize=64)
+def _d20_faces(attack_roll):
+    """Probability of each natural face 1-20 for '1d20', '1d20adv' or '1d20dis'"""
+    faces = distribution(attack_roll)
+    return tuple(faces.prob(face) for face in range(1, 21))
+
+
+def hit_chance(attack_bonus, armor_class, attack_roll="1d20"):
+    """
+    Chance to hit and to crit with the same rules as CombatSystem.make_attack_roll:
+    natural 20 always hits (and crits), natural 1 always misses, otherwise d20 + bonus >= AC.
+    Returns (hit chance, crit chance); the hit chance includes crits.
+    """
+    faces = _d20_faces(attack_roll)
+    lowest_hit = min(20, max(2, armor_class - attack_bonus))
+    hit = sum(faces[lowest_hit - 1:19]) + faces[19]
+    return hit, faces[19]
+
+
+@lru_cache(maxsize=256)
+def damage_distribution(weapon_damage, damage_modifier=0, critical=False):
+    """
+    Distribution of one hit's damage, with the minimum 1 damage rule.
+    Critical hits roll the damage dice twice (flat modifiers are only added once).
+    """
+    weapon = distribution(weapon_damage)
+    if critical:
+        extra_dice = weapon.shift(-compile_notation(weapon_damage).modifier)
+        weapon = weapon.convolve(extra_dice)
+    return weapon.shift(damage_modifier).clamp(1)
+
+
+def attack_damage_distribution(attack_bonus, armor_class, weapon_damage, damage_modifier=0, attack_roll="1d20"):
+    """Distribution of the damage a single attack deals, counting misses as 0"""
+    hit, crit = hit_chance(attack_bonus, armor_class, attack_roll)
+    return mixture([
+        (1.0 - hit, DiceDistribution(0, [1])),
+        (hit - crit, damage_distribution(weapon_damage, damage_modifier)),
+        (crit, damage_distribution(weapon_damage, damage_modifier, True))
+    ])
+
+
+def expected_damage(attack_bonus, armor_class, weapon_damage, damage_modifier=0, attack_roll="1d20"):
+    """Expected damage of a single attack"""
+    hit, crit = hit_chance(attack_bonus, armor_class, attack_roll)
+    normal = damage_distribution(weapon_damage, damage_modifier).mean
+    critical = damage_distribution(weapon_damage, damage_modifier, True).mean
+    return (hit - crit) * normal + crit * critical
+
+
+def dpr_table(attack_bonus, weapon_damage, damage_modifier=0, armor_classes=DEFAULT_AC_RANGE,
+              attacks=1, attack_roll="1d20"):
+    """
+    Hit chance, crit chance and damage per round against every AC in one call.
+    Damage means and d20 face odds are worked out once and shared by every row.
+    """
+    faces = _d20_faces(attack_roll)
+    normal = damage_distribution(weapon_damage, damage_modifier).mean
+    critical = damage_distribution(weapon_damage, damage_modifier, True).mean
+    crit = faces[19]
+
+    # at_least[n] = chance of a natural roll in n..19, for the non-crit hits
+    at_least = [0.0] * 21
+    for face in range(19, 0, -1):
+        at_least[face] = at_least[face + 1] + faces[face - 1]
+
+    table = []
+    for armor_class in armor_classes:
+        lowest_hit = min(20, max(2, armor_class - attack_bonus))
+        hit = at_least[lowest_hit] + crit
+        table.append({
+            'armor_class': armor_class,
+            'hit_chance': hit,
+            'crit_chance': crit,
+            'dpr': attacks * ((hit - crit) * normal + crit * critical)
+        })
+    return table
+
+
+def attack_profile(attacker, defender, weapon_damage=None, attack_roll="1d20"):
+    """
+    Closed-form odds for an attacker/defender pair (Characters or monster dicts).
+    Uses the same attack bonus, damage and AC that CombatSystem.run_encounter would.
+    """
+    attacking = Combatant.from_source(attacker, PARTY)
+    defending = Combatant.from_source(defender, ENEMIES)
+    damage = weapon_damage or attacking.damage.notation
+
+    hit, crit = hit_chance(attacking.attack_bonus, defending.armor_class, attack_roll)
+    damage_per_attack = attack_damage_distribution(
+        attacking.attack_bonus, defending.armor_class, damage, attacking.damage_modifier, attack_roll
+    )
+    return {
+        'attack_bonus': attacking.attack_bonus,
+        'target_ac': defending.armor_class,
+        'hit_chance': hit,
+        'crit_chance': crit,
+        'expected_damage': damage_per_attack.mean,
+        'damage_distribution': damage_per_attack
+    }
@@ -0,0 +1,278 @@
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from types import MappingProxyType
+
+ABILITIES = ('strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma')
+
+# Packs live in content/: core.json first, then every homebrew/*.json in name order
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'content')
+CORE_PACK = 'core.json'
+HOMEBREW_DIR = 'homebrew'
+
+# Compiled rulesets are cached here; bump CACHE_VERSION when the compiled layout changes
+CACHE_DIR = '.cache'
+CACHE_FILE = 'ruleset.bin'
+CACHE_VERSION = 1
+HEADER_SIZE = struct.Struct('<Q')
+
+TABLES = ('skills', 'races', 'classes')
+_MISSING = object()
+
+# Extra racial ASI key: number of +1s the player spreads over abilities of their choice
+ASI_CHOICE = 'choice'
+
+DEFAULT_HIT_DIE = 8
+HIT_DICE = (6, 8, 10, 12)
+
+
+def _freeze(value):
+    """Read-only copy of a nested table (dicts become mapping proxies, lists become tuples)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def pack_paths(content_dir=CONTENT_DIR):
+    """Pack files in load order: the core pack, then homebrew packs sorted by file name"""
+    paths = []
+    core = os.path.join(content_dir, CORE_PACK)
+    if os.path.exists(core):
+        paths.append(core)
+    homebrew = os.path.join(content_dir, HOMEBREW_DIR)
+    if os.path.isdir(homebrew):
+        paths.extend(os.path.join(homebrew, name) for name in sorted(os.listdir(homebrew))
+                     if name.endswith('.json'))
+    return paths
+
+
+def validate_pack(pack, source="pack"):
+    """Check a parsed pack and raise ValueError naming the first bad entry"""
+    if not isinstance(pack, dict):
+        raise ValueError(f"{source}: a content pack must be a JSON object")
+    for table in TABLES:
+        if not isinstance(pack.get(table, {}), dict):
+            raise ValueError(f"{source}: '{table}' must be an object mapping names to entries")
+
+    for skill, ability in pack.get('skills', {}).items():
+        if ability not in ABILITIES:
+            raise ValueError(f"{source}: skill '{skill}' uses unknown ability '{ability}'")
+
+    for race, entry in pack.get('races', {}).items():
+        if not isinstance(entry, dict):
+            raise ValueError(f"{source}: race '{race}' must be an object")
+        if not isinstance(entry.get('asi', {}), dict):
+            raise ValueError(f"{source}: race '{race}' asi must be an object of ability bonuses")
+        for ability, bonus in entry.get('asi', {}).items():
+            if ability not in ABILITIES and ability != ASI_CHOICE:
+                raise ValueError(f"{source}: race '{race}' boosts unknown ability '{ability}'")
+            if not isinstance(bonus, int):
+                raise ValueError(f"{source}: race '{race}' has a non-integer bonus for '{ability}'")
+        traits = entry.get('traits', [])
+        if not isinstance(traits, list) or not all(isinstance(trait, str) for trait in traits):
+            raise ValueError(f"{source}: race '{race}' traits must be a list of names")
+
+    for character_class, entry in pack.get('classes', {}).items():
+        if not isinstance(entry, dict):
+            raise ValueError(f"{source}: class '{character_class}' must be an object")
+        if entry.get('hit_die', DEFAULT_HIT_DIE) not in HIT_DICE:
+            raise ValueError(f"{source}: class '{character_class}' hit die must be one of {HIT_DICE}")
+
+
+def compile_packs(paths):
+    """
+    Parse, validate and merge packs in order into plain tables.
+    Names are lower-cased; a later pack replaces any race, class or skill it redefines.
+    """
+    tables = {'skills': {}, 'races': {}, 'classes': {}, 'packs': []}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                pack = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}: invalid JSON ({e})") from e
+        validate_pack(pack, path)
+
+        tables['packs'].append(pack.get('name', os.path.splitext(os.path.basename(path))[0]))
+        for skill, ability in pack.get('skills', {}).items():
+            tables['skills'][skill.lower()] = ability
+        for race, entry in pack.get('races', {}).items():
+            tables['races'][race.lower()] = {
+                'asi': dict(entry.get('asi', {})),
+                'traits': list(entry.get('traits', []))
+            }
+        for character_class, entry in pack.get('classes', {}).items():
+            tables['classes'][character_class.lower()] = {
+                'hit_die': entry.get('hit_die', DEFAULT_HIT_DIE)
+            }
+    return tables
+
+
+def _fingerprint(paths):
+    """
+    Identifies the packs on disk from file metadata alone, without reading them.
+    The marshal format can change between Python versions, so those are part of it too.
+    """
+    entries = []
+    for path in paths:
+        stat = os.stat(path)
+        entries.append((path, stat.st_size, stat.st_mtime_ns))
+    return (CACHE_VERSION, marshal.version, tuple(sys.version_info[:2]), tuple(entries))
+
+
+def encode_tables(fingerprint, tables):
+    """
+    Compiled form of the tables: a small header with each table's names and entry offsets,
+    followed by every entry marshalled on its own so it can be decoded when first used.
+    """
+    body = bytearray()
+    index = {'packs': tuple(tables['packs'])}
+    for table in TABLES:
+        names = tuple(tables[table])
+        offsets = array('Q', [len(body)])
+        for name in names:
+            body += marshal.dumps(tables[table][name])
+            offsets.append(len(body))
+        index[table] = (names, offsets.tobytes())
+    header = marshal.dumps((fingerprint, index))
+    return HEADER_SIZE.pack(len(header)) + header + body
+
+
+def _decode_header(data):
+    """(fingerprint, index, offset of the first entry) from a compiled ruleset"""
+    (length,) = HEADER_SIZE.unpack_from(data, 0)
+    fingerprint, index = marshal.loads(data[HEADER_SIZE.size:HEADER_SIZE.size + length])
+    return fingerprint, index, HEADER_SIZE.size + length
+
+
+def _read_cache(cache_path, fingerprint):
+    """Memory-mapped compiled ruleset if the cache matches the packs on disk"""
+    try:
+        with open(cache_path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        cached = _decode_header(data)
+    except (struct.error, EOFError, ValueError, TypeError):
+        cached = None
+    if cached is None or cached[0] != fingerprint:
+        data.close()
+        return None
+    return data, cached
+
+
+def _write_cache(cache_path, data):
+    """Write the compiled ruleset atomically; a read-only content dir just means no cache"""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+class CompiledTable(Mapping):
+    """
+    Read-only table backed by a compiled ruleset.
+    Only the names are loaded up front; an entry is unmarshalled and frozen the first
+    time it is looked up, so big homebrew packs cost nothing until their content is used.
+    """
+
+    def __init__(self, data, base, names, offsets, convert=None):
+        self._data = data
+        self._base = base
+        self._names = names
+        self._positions = dict(zip(names, range(len(names))))
+        self._offsets = array('Q')
+        self._offsets.frombytes(offsets)
+        self._convert = convert
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        value = self._loaded.get(name, _MISSING)
+        if value is _MISSING:
+            position = self._positions[name]
+            start = self._base + self._offsets[position]
+            end = self._base + self._offsets[position + 1]
+            value = _freeze(marshal.loads(self._data[start:end]))
+            if self._convert is not None:
+                value = self._convert(value)
+            self._loaded[name] = value
+        return value
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return f"CompiledTable({len(self._names)} entries)"
+
+
+class Ruleset:
+    """
+    Frozen races, classes and skills compiled from the content packs.
+    Every table is a read-only mapping, so the ruleset can be shared freely.
+    """
+
+    def __init__(self, data, header=None):
+        _, index, base = header or _decode_header(data)
+        self._data = data
+        self.packs = index['packs']
+        self.skills = CompiledTable(data, base, *index['skills'])
+        self.races = CompiledTable(data, base, *index['races'])
+        self.classes = CompiledTable(data, base, *index['classes'])
+        self.hit_dice = CompiledTable(data, base, *index['classes'], convert=_hit_die_of)
+
+    @property
+    def race_names(self):
+        return tuple(self.races)
+
+    @property
+    def class_names(self):
+        return tuple(self.classes)
+
+    def hit_die(self, character_class):
+        return self.hit_dice.get(character_class.lower(), DEFAULT_HIT_DIE)
+
+
+def _hit_die_of(entry):
+    return entry['hit_die']
+
+
+def load_ruleset(content_dir=CONTENT_DIR, use_cache=True):
+    """
+    Load the ruleset, compiling the packs only when they changed since the last run.
+    The cache is keyed on each pack's path, size and modification time, so an unchanged
+    install maps the compiled file and reads just its index: no JSON parsing, no validation,
+    and entries are only decoded when the game looks them up.
+    """
+    paths = pack_paths(content_dir)
+    if not paths:
+        raise ValueError(f"No content packs found in {content_dir}")
+
+    cache_path = os.path.join(content_dir, CACHE_DIR, CACHE_FILE)
+    fingerprint = _fingerprint(paths)
+    if use_cache:
+        cached = _read_cache(cache_path, fingerprint)
+        if cached is not None:
+            return Ruleset(*cached)
+
+    data = encode_tables(fingerprint, compile_packs(paths))
+    if use_cache:
+        _write_cache(cache_path, data)
+    return Ruleset(data)
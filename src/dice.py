@@ -1,53 +1,434 @@
+import hashlib
 import random
+import re
+import secrets
+from array import array
+from functools import lru_cache
+from operator import add, neg
+
+# Safety cap so a run of maximum rolls on an exploding die can't loop forever
+MAX_EXPLOSIONS = 100
+
+# One signed term of an expression: "+2d6", "-1", "4d6dl1", "1d20adv"
+_TERM_PATTERN = re.compile(r'([+-]?)([^+-]+)')
+_DICE_PATTERN = re.compile(r'^(\d*)d(\d+|%)(!)?(?:(kh|kl|dh|dl)(\d*)|(adv|dis))?$')
+
+_NOTATION_HELP = "Invalid dice notation. Use format like '1d20', '2d6', '2d6+3', '4d6dl1', '1d20adv'"
+
+
+class DiceTerm:
+    """A single group of dice inside a compiled expression (e.g. the 4d6dl1 in 4d6dl1+2)"""
+    __slots__ = ('count', 'sides', 'sign', 'keep', 'keep_highest', 'explode')
+
+    def __init__(self, count, sides, sign=1, keep=None, keep_highest=True, explode=False):
+        self.count = count
+        self.sides = sides
+        self.sign = sign
+        self.keep = keep  # Number of dice kept, None keeps them all
+        self.keep_highest = keep_highest
+        self.explode = explode
+
+    @property
+    def is_plain(self):
+        """True when the term is a straight sum of dice (no keep/drop, no exploding)"""
+        return self.keep is None and not self.explode
+
+    def notation(self):
+        """Canonical notation for this term, without its sign"""
+        text = f"{self.count}d{self.sides}"
+        if self.explode:
+            text += "!"
+        if self.keep is not None:
+            text += f"{'kh' if self.keep_highest else 'kl'}{self.keep}"
+        return text
+
+    def roll_die(self, rng):
+        """Roll one die of this term, following explosions"""
+        sides = self.sides
+        face = int(rng.random() * sides) + 1
+        if self.explode:
+            value = face
+            explosions = 0
+            while face == sides and explosions < MAX_EXPLOSIONS:
+                face = int(rng.random() * sides) + 1
+                value += face
+                explosions += 1
+            return value
+        return face
+
+    def roll(self, rng):
+        """Roll the term, returning (faces, signed subtotal)"""
+        if self.explode:
+            faces = [self.roll_die(rng) for _ in range(self.count)]
+        else:
+            rand = rng.random
+            sides = self.sides
+            faces = [int(rand() * sides) + 1 for _ in range(self.count)]
+
+        if self.keep is None:
+            subtotal = sum(faces)
+        else:
+            subtotal = sum(sorted(faces, reverse=self.keep_highest)[:self.keep])
+        return faces, self.sign * subtotal
+
+    def total(self, rng):
+        """Roll the term and return only its signed subtotal"""
+        if self.count == 1 and self.is_plain:
+            return self.sign * (int(rng.random() * self.sides) + 1)
+        return self.roll(rng)[1]
+
+    def roll_many(self, rng, times):
+        """
+        Roll the term `times` times in one pass.
+        Returns (faces, subtotals): faces is flat and row-major, `count` dice per roll.
+        """
+        draws = times * self.count
+        if self.explode:
+            faces = [self.roll_die(rng) for _ in range(draws)]
+        else:
+            # choices() draws floor(random() * sides) per die, same as the single-roll path
+            faces = rng.choices(range(1, self.sides + 1), k=draws)
+
+        count = self.count
+        if count == 1:
+            subtotals = faces
+        else:
+            rows = zip(*[iter(faces)] * count)
+            if self.keep is None:
+                subtotals = list(map(sum, rows))
+            elif self.keep == 1:
+                subtotals = list(map(max if self.keep_highest else min, rows))
+            else:
+                keep = self.keep
+                reverse = self.keep_highest
+                subtotals = [sum(sorted(row, reverse=reverse)[:keep]) for row in rows]
+
+        if self.sign < 0:
+            subtotals = list(map(neg, subtotals))
+        return faces, subtotals
+
+
+class DiceExpression:
+    """
+    A dice notation compiled once into terms plus a flat modifier.
+    Rolling only costs the RNG draws and a few integer adds.
+    """
+    __slots__ = ('terms', 'modifier', 'notation', 'dice', 'dice_count', 'single_die')
+
+    def __init__(self, terms, modifier, notation):
+        self.terms = tuple(terms)
+        self.modifier = modifier
+        self.notation = notation
+        self.dice = _join_terms(self.terms) or "0"
+        self.dice_count = sum(term.count for term in self.terms)
+
+        # Sides of the die when the expression is one plain die ("1d20", "1d8+3"), else 0
+        self.single_die = 0
+        if len(self.terms) == 1:
+            term = self.terms[0]
+            if term.count == 1 and term.sign > 0 and term.is_plain:
+                self.single_die = term.sides
+
+    def roll(self, rng):
+        """Roll every term, returning (faces, dice total before the modifier)"""
+        if len(self.terms) == 1:
+            return self.terms[0].roll(rng)
+
+        faces = []
+        dice_total = 0
+        for term in self.terms:
+            term_faces, subtotal = term.roll(rng)
+            faces.extend(term_faces)
+            dice_total += subtotal
+        return faces, dice_total
+
+    def total(self, rng):
+        """Roll the expression and return only the final total"""
+        if self.single_die:
+            return int(rng.random() * self.single_die) + 1 + self.modifier
+        total = self.modifier
+        for term in self.terms:
+            total += term.total(rng)
+        return total
+
+    def roll_many(self, rng, times, with_rolls=False):
+        """
+        Roll the expression `times` times.
+        Returns an array of final totals, plus a RollMatrix of the dice when with_rolls is set.
+        """
+        totals = None
+        term_faces = []
+        for term in self.terms:
+            faces, subtotals = term.roll_many(rng, times)
+            totals = subtotals if totals is None else list(map(add, totals, subtotals))
+            if with_rolls:
+                term_faces.append((faces, term.count))
+
+        if self.modifier:
+            modifier = self.modifier
+            totals = [total + modifier for total in totals]
+        totals = array('q', totals)
+
+        if not with_rolls:
+            return totals
+        return totals, RollMatrix.from_terms(term_faces, times, self.dice_count)
+
+
+class RollResult:
+    """
+    Immutable result of a single roll.
+    Only the raw faces and total are stored; the rolls list is built on request,
+    and the notation strings come from the compiled expression.
+    Supports result['final_total'] style access for code written against the old dict.
+    """
+    __slots__ = ('_expression', '_faces', '_total')
+
+    KEYS = ('rolls', 'total', 'dice', 'modifier', 'final_total', 'notation')
+
+    def __init__(self, expression, faces, total):
+        self._expression = expression
+        self._faces = faces  # A lone int for single-die rolls, otherwise the list of faces
+        self._total = total
+
+    @property
+    def rolls(self):
+        faces = self._faces
+        if isinstance(faces, int):
+            return [faces]
+        return list(faces)
+
+    @property
+    def total(self):
+        """Sum of the dice, before the modifier"""
+        return self._total
+
+    @property
+    def modifier(self):
+        return self._expression.modifier
+
+    @property
+    def final_total(self):
+        return self._total + self._expression.modifier
+
+    @property
+    def dice(self):
+        return self._expression.dice
+
+    @property
+    def notation(self):
+        return self._expression.notation
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.KEYS:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return self.KEYS
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __int__(self):
+        return self.final_total
+
+    def __repr__(self):
+        return f"RollResult({self.notation!r}, rolls={self.rolls}, final_total={self.final_total})"
+
+
+class RollMatrix:
+    """
+    Individual dice from a batch roll, stored flat and row-major in a compact array.
+    Row i holds the dice of roll i; exploded dice hold the sum of their chain.
+    """
+    __slots__ = ('data', 'width')
+
+    def __init__(self, data, width):
+        self.data = data
+        self.width = width
+
+    @classmethod
+    def from_terms(cls, term_faces, times, width):
+        """Interleave the flat per-term face lists into one row-major matrix"""
+        if len(term_faces) == 1:
+            return cls(array('l', term_faces[0][0]), width)
+
+        data = array('l')
+        for row in range(times):
+            for faces, count in term_faces:
+                start = row * count
+                data.extend(faces[start:start + count])
+        return cls(data, width)
+
+    def __len__(self):
+        return len(self.data) // self.width if self.width else 0
+
+    def row(self, index):
+        """Dice rolled for a single roll"""
+        start = index * self.width
+        return self.data[start:start + self.width]
+
+    def column(self, index):
+        """The given die position across every roll"""
+        return self.data[index::self.width]
+
+
+def _join_terms(terms):
+    """Render dice terms back into a single notation string"""
+    text = ""
+    for term in terms:
+        if term.sign < 0:
+            text += "-"
+        elif text:
+            text += "+"
+        text += term.notation()
+    return text
+
+
+def _parse_dice_term(body, sign):
+    """Parse the dice part of a term like '4d6dl1' or 'd20adv'"""
+    match = _DICE_PATTERN.match(body)
+    if not match:
+        raise ValueError(_NOTATION_HELP)
+
+    count_str, sides_str, explode, keep_kind, keep_str, advantage = match.groups()
+    count = int(count_str) if count_str else 1
+    sides = 100 if sides_str == '%' else int(sides_str)
+    if count < 1 or sides < 1:
+        raise ValueError(_NOTATION_HELP)
+    if explode and sides < 2:
+        raise ValueError("Exploding dice need at least 2 sides")
+
+    keep = None
+    keep_highest = True
+    if advantage:
+        if count != 1:
+            raise ValueError("Advantage/disadvantage applies to a single die, e.g. '1d20adv'")
+        count = 2
+        keep = 1
+        keep_highest = advantage == 'adv'
+    elif keep_kind:
+        amount = int(keep_str) if keep_str else 1
+        if amount > count:
+            raise ValueError(f"Cannot keep or drop {amount} dice from {count}d{sides}")
+        if keep_kind[0] == 'k':
+            keep = amount
+            keep_highest = keep_kind == 'kh'
+        else:
+            # Dropping the lowest N is keeping the highest (count - N), and vice versa
+            keep = count - amount
+            keep_highest = keep_kind == 'dl'
+
+    return DiceTerm(count, sides, sign, keep, keep_highest, bool(explode))
+
+
+@lru_cache(maxsize=512)
+def compile_notation(dice_notation):
+    """
+    Compile dice notation into a reusable DiceExpression.
+    Supports multiple terms ("2d6+1d4+3"), keep/drop ("4d6dl1", "2d20kh1"),
+    exploding dice ("1d6!") and advantage/disadvantage ("1d20adv", "1d20dis").
+    """
+    text = dice_notation.lower().replace(" ", "")
+    if not text or 'd' not in text:
+        raise ValueError(_NOTATION_HELP)
+
+    terms = []
+    modifier = 0
+    position = 0
+    for match in _TERM_PATTERN.finditer(text):
+        if match.start() != position:
+            raise ValueError(_NOTATION_HELP)
+        position = match.end()
+
+        sign = -1 if match.group(1) == '-' else 1
+        body = match.group(2)
+        if body.isdigit():
+            modifier += sign * int(body)
+        else:
+            terms.append(_parse_dice_term(body, sign))
+
+    if position != len(text) or not terms:
+        raise ValueError(_NOTATION_HELP)
+
+    return DiceExpression(terms, modifier, text)
+
+
+def derive_seed(root_seed, spawn_key):
+    """Hash a root seed and a spawn path into an independent 256-bit stream seed"""
+    text = ":".join(str(part) for part in (root_seed,) + tuple(spawn_key))
+    return int.from_bytes(hashlib.sha256(text.encode()).digest(), 'big')
+
 
 class DiceRoller:
-    def __init__(self):
-        pass
+    def __init__(self, seed=None, spawn_key=()):
+        """
+        Each roller owns its own generator instead of the global random module.
+        With the same seed (and spawn key) it replays exactly the same rolls.
+        """
+        if seed is None:
+            seed = secrets.randbits(128)
+        self.seed = seed
+        self.spawn_key = tuple(spawn_key)
+        self.spawned = 0
+        self.rng = random.Random(derive_seed(seed, self.spawn_key))
+
+    def spawn(self, count=None):
+        """
+        Create child rollers with statistically independent streams
+        (one per worker, combat, session...). Children are numbered in spawn order,
+        so the same root seed always hands out the same streams.
+        Returns a single roller, or a list when count is given.
+        """
+        if count is None:
+            return self._spawn_one()
+        return [self._spawn_one() for _ in range(count)]
+
+    def _spawn_one(self):
+        child = DiceRoller(self.seed, self.spawn_key + (self.spawned,))
+        self.spawned += 1
+        return child
 
     def roll(self, dice_notation):
         """
         Roll dice using standard D&D notation
-        Examples: "1d20", "2d6", "1d8+3", "3d6+2"
-        """
-        dice_notation = dice_notation.lower().replace(" ", "")
-
-        # Handle modifiers (+ or -)
-        modifier = 0
-        if '+' in dice_notation:
-            dice_part, mod_part = dice_notation.split('+')
-            modifier = int(mod_part)
-        elif '-' in dice_notation:
-            dice_part, mod_part = dice_notation.split('-')
-            modifier = -int(mod_part)
-        else:
-            dice_part = dice_notation
-        
-        # Parse dice (format: XdY)
-        if 'd' not in dice_part:
-            raise ValueError("Invalid dice notation. Use format like '1d20', '2d6', '2d6+3'")
+        Examples: "1d20", "2d6", "1d8+3", "3d6+2", "2d6+1d4+3", "4d6dl1", "1d20adv"
+        """
+        expression = compile_notation(dice_notation)
+        if expression.single_die:
+            face = int(self.rng.random() * expression.single_die) + 1
+            return RollResult(expression, face, face)
 
-        count_str, sides_str = dice_part.split('d')
-        count = int(count_str)
-        sides = int(sides_str)
+        faces, total = expression.roll(self.rng)
+        return RollResult(expression, faces, total)
 
-        # Roll the dice
-        result = self.roll_multiple(count, sides)
-        result['modifier'] = modifier
-        result['final_total'] = result['total'] + modifier
-        result['notation'] = dice_notation
+    def roll_total(self, dice_notation):
+        """Fast path: roll dice notation and return only the final total as an int"""
+        return compile_notation(dice_notation).total(self.rng)
 
-        return result
+    def roll_many(self, dice_notation, times, with_rolls=False):
+        """
+        Roll dice notation `times` times in one call.
+        Returns an array of final totals, or (totals, RollMatrix) when with_rolls=True.
+        """
+        if times < 0:
+            raise ValueError("Number of rolls cannot be negative")
+        return compile_notation(dice_notation).roll_many(self.rng, times, with_rolls)
 
     def roll_single(self, sides):
         """Roll a single die with the given number of sides."""
-        return random.randint(1, sides)
-    
+        return self.rng.randint(1, sides)
+
     def roll_multiple(self, count, sides):
         """Roll multiple dice and return individual results + total"""
-        rolls = [self.roll_single(sides) for _ in range(count)]
-        total = sum(rolls)
+        rolls, total = compile_notation(f"{count}d{sides}").terms[0].roll(self.rng)
         return {
             'rolls': rolls,
             'total': total,
             'dice': f"{count}d{sides}"
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,171 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from math import sqrt
+from statistics import NormalDist
+
+from .combat import ENEMIES, PARTY, Combatant, CombatSystem
+from .dice import DiceRoller
+
+
+class BalanceReport:
+    """Monte Carlo estimates for an encounter, each with a confidence interval"""
+
+    def __init__(self, fights, confidence, win_rate, win_interval, tpk_rate, tpk_interval,
+                 mean_rounds, rounds_interval, mean_hp_remaining, hp_interval, converged):
+        self.fights = fights
+        self.confidence = confidence
+        self.win_rate = win_rate
+        self.win_interval = win_interval
+        self.tpk_rate = tpk_rate
+        self.tpk_interval = tpk_interval
+        self.mean_rounds = mean_rounds
+        self.rounds_interval = rounds_interval
+        self.mean_hp_remaining = mean_hp_remaining  # Party HP left at the end of a fight
+        self.hp_interval = hp_interval
+        self.converged = converged  # True when the intervals got tight enough before max_fights
+
+    def display(self):
+        """Print the report"""
+        level = f"{self.confidence:.0%}"
+        print(f"\n=== Encounter Balance ({self.fights} fights, {level} intervals) ===")
+        print(f"  Party win rate: {self.win_rate:.1%} ({self.win_interval[0]:.1%} - {self.win_interval[1]:.1%})")
+        print(f"  TPK chance: {self.tpk_rate:.1%} ({self.tpk_interval[0]:.1%} - {self.tpk_interval[1]:.1%})")
+        print(f"  Rounds: {self.mean_rounds:.2f} ({self.rounds_interval[0]:.2f} - {self.rounds_interval[1]:.2f})")
+        print(f"  Party HP remaining: {self.mean_hp_remaining:.2f} ({self.hp_interval[0]:.2f} - {self.hp_interval[1]:.2f})")
+        if not self.converged:
+            print("  (stopped at the fight limit before reaching the requested precision)")
+
+
+def _wilson_interval(successes, trials, z):
+    """Wilson score interval for a proportion"""
+    if not trials:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half = z * sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def _mean_interval(total, total_squares, count, z):
+    """Mean and normal-approximation interval from running sums"""
+    mean = total / count
+    variance = max(0.0, total_squares / count - mean * mean)
+    half = z * sqrt(variance / count)
+    return mean, (mean - half, mean + half)
+
+
+def _run_batch(party_blocks, monster_blocks, seed, spawn_key, fights, max_rounds):
+    """Worker: run a batch of fights on its own RNG stream and return the running sums"""
+    combat = CombatSystem(DiceRoller(seed, spawn_key))
+    wins = tpks = 0
+    rounds_sum = rounds_squares = 0
+    hp_sum = hp_squares = 0
+    for _ in range(fights):
+        result = combat.run_encounter(party_blocks, monster_blocks, max_rounds)
+        wins += result.winner == PARTY
+        tpks += result.winner == ENEMIES
+        rounds_sum += result.rounds
+        rounds_squares += result.rounds * result.rounds
+        hp_sum += result.party_hit_points
+        hp_squares += result.party_hit_points * result.party_hit_points
+    return fights, wins, tpks, rounds_sum, rounds_squares, hp_sum, hp_squares
+
+
+def balance_encounter(party, monsters, max_fights=100000, min_fights=2000, batch_size=500,
+                      workers=None, confidence=0.95, tolerance=0.01, mean_tolerance=0.05, max_rounds=100,
+                      seed=None):
+    """
+    Estimate how an encounter plays out by simulating many fights across a process pool.
+    party: Characters (or stat block dicts); monsters: monster stat block dicts.
+    Stops once the win and TPK intervals are within +/- tolerance, the rounds interval is
+    within +/- mean_tolerance of the mean rounds and the HP interval is within +/- mean_tolerance
+    of the party's starting HP (or at max_fights). HP is measured against the party's HP
+    rather than its own mean, since a hard fight leaves almost none.
+    Batches are seeded from `seed` and merged in order, so a seed gives the same report
+    no matter how many workers are used.
+    """
+    if max_fights < 1:
+        raise ValueError("max_fights must be at least 1")
+
+    # Flatten everything into plain dicts so they pickle small and cheaply
+    party_blocks = [Combatant.from_source(member, PARTY).stat_block() for member in party]
+    monster_blocks = [Combatant.from_source(monster, ENEMIES).stat_block() for monster in monsters]
+    party_hit_points = max(1, sum(block['hit_points'] for block in party_blocks))
+    root = DiceRoller(seed)
+    workers = workers or os.cpu_count() or 1
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    totals = [0] * 7
+    batches_submitted = 0
+
+    def next_batch():
+        nonlocal batches_submitted
+        fights = min(batch_size, max_fights - batches_submitted * batch_size)
+        if fights <= 0:
+            return None
+        spawn_key = root.spawn().spawn_key
+        batches_submitted += 1
+        return (party_blocks, monster_blocks, root.seed, spawn_key, fights, max_rounds)
+
+    def precise_enough():
+        fights, wins, tpks, rounds_sum, rounds_squares, hp_sum, hp_squares = totals
+        if fights < min_fights:
+            return False
+        for successes in (wins, tpks):
+            low, high = _wilson_interval(successes, fights, z)
+            if (high - low) / 2 > tolerance:
+                return False
+        mean, (low, high) = _mean_interval(rounds_sum, rounds_squares, fights, z)
+        if (high - low) / 2 > mean_tolerance * mean:
+            return False
+        _, (low, high) = _mean_interval(hp_sum, hp_squares, fights, z)
+        return (high - low) / 2 <= mean_tolerance * party_hit_points
+
+    converged = False
+    if workers == 1:
+        args = next_batch()
+        while args:
+            totals = [a + b for a, b in zip(totals, _run_batch(*args))]
+            if precise_enough():
+                converged = True
+                break
+            args = next_batch()
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            # Keep every worker busy with one batch queued behind it
+            while len(pending) < workers * 2:
+                args = next_batch()
+                if not args:
+                    break
+                pending.append(pool.submit(_run_batch, *args))
+
+            while pending:
+                totals = [a + b for a, b in zip(totals, pending.popleft().result())]
+                if precise_enough():
+                    converged = True
+                    for future in pending:
+                        future.cancel()
+                    break
+                args = next_batch()
+                if args:
+                    pending.append(pool.submit(_run_batch, *args))
+
+    fights, wins, tpks, rounds_sum, rounds_squares, hp_sum, hp_squares = totals
+    mean_rounds, rounds_interval = _mean_interval(rounds_sum, rounds_squares, fights, z)
+    mean_hp, hp_interval = _mean_interval(hp_sum, hp_squares, fights, z)
+    return BalanceReport(
+        fights,
+        confidence,
+        wins / fights,
+        _wilson_interval(wins, fights, z),
+        tpks / fights,
+        _wilson_interval(tpks, fights, z),
+        mean_rounds,
+        rounds_interval,
+        mean_hp,
+        hp_interval,
+        converged
+    )
@@ -13,18 +13,19 @@ from .starter_ai import AIInterface
 # from .advanced_ai import AIInterface
 
 """Import Other Game Modules"""
-from .character import Character
+from .character import RULESET, Character
 from .dice import DiceRoller
 from .game_state import GameState
 from .combat import CombatSystem
 
 class GameLoop:
-    def __init__(self):
+    def __init__(self, seed=None):
         self.ai = AIInterface()
-        self.character = Character()
-        self.dice = DiceRoller()
+        # One root roller per session; everything else gets its own child stream
+        self.dice = DiceRoller(seed)
+        self.character = Character(dice=self.dice.spawn())
         self.game_state = GameState()
-        self.combat = CombatSystem()
+        self.combat = CombatSystem(self.dice.spawn())
         self.running = False
 
     """----------------"""
@@ -54,10 +55,10 @@ class GameLoop:
         print("\n--- Character Creation ---")
 
         name = input("Enter your character's name: ")
-        character = Character(name)
+        character = Character(name, dice=self.dice.spawn())
 
         # Race selection
-        races = ['human', 'elf', 'dwarf', 'halfling', 'dragonborn', 'gnome', 'half-elf', 'half-orc', 'tiefling']
+        races = RULESET.race_names
         print(f"Available races: {', '.join(races)}")
 
         race = None
@@ -69,7 +70,7 @@ class GameLoop:
 
 
         # Classes selection
-        classes = ['fighter', 'wizard', 'rogue', 'cleric', 'ranger', 'barbarian', 'bard', 'druid', 'monk', 'paladin', 'sorcerer', 'warlock']
+        classes = RULESET.class_names
         print(f"Avaliable classes: {', '.join(classes)}")
 
         character_class = None
@@ -207,7 +208,7 @@ class GameLoop:
 
             elif choice == '3':
                 print("\n--- Recent History ---")
-                history = self.game_state.get_recent_history[-12:]
+                history = self.game_state.get_recent_history(12)
                 for entry in history:
                     print(entry)
             
@@ -259,11 +260,13 @@ class GameLoop:
                     action = input("Add or remove item? (a/r): ").strip().lower()
                     item = input("Enter item name: ").strip()
                     if action == 'a':
-                        self.game_state.player.add_item(item)
+                        self.game_state.player.add_to_inventory(item)
                         print(f"Added {item} to inventory.")
                     elif action == 'r':
-                        self.game_state.player.remove_item(item)
-                        print(f"Removed {item} from inventory.")
+                        if self.game_state.player.remove_from_inventory(item):
+                            print(f"Removed {item} from inventory.")
+                        else:
+                            print(f"{item} is not in inventory.")
                     else:
                         print("Invalid action. Use 'a' to add or 'r' to remove.")
                 else:
@@ -292,8 +295,9 @@ class GameLoop:
         print("4. Save game")
         print("5. Quit game")
         print("6. Developer Menu") # Delete in Final Build - ONLY FOR DEV TESTING PURPOSES
+        print("7. Undo last action")
         
-        choice = input("Choose (1-6): ").strip()
+        choice = input("Choose (1-7): ").strip()
 
         if choice == '1':
             action = input("Describe your action: ")
@@ -309,6 +313,9 @@ class GameLoop:
             self.quit_game()
         elif choice == '6':
             self.dev_menu()
+        elif choice == '7':
+            if self.game_state.undo():
+                print(f"Undone. You are back in {self.game_state.current_location}.")
         else: 
             print("Invalid choice. Please select a valid option.")
 
@@ -318,12 +325,17 @@ class GameLoop:
 
     def handle_action(self, action):
         """Handle the player's action and AI response"""
+        # Snapshot first so the whole action (including the DM's response) can be undone
+        self.game_state.snapshot("action")
+
         # Add action to history
         self.game_state.add_to_history("action", f"Player: {action}")
 
-        # Send action to AI
-        history = self.game_state.get_recent_history(5)
-        context = self.game_state.get_context_for_ai()
+        # Send action to AI, with the recent events and the older ones (and world facts) it relates to
+        context = self.game_state.get_context_for_ai(query=action)
+        recent = "\n".join(f"- {event['description']}" for event in context['recent_history'][:-1]) or "- Nothing yet"
+        relevant = "\n".join(f"- {event['description']}" for event in context['relevant_history']) or "- Nothing relevant"
+        facts = "\n".join(f"- {key}: {value}" for key, value in context['relevant_world'].items()) or "- None"
         prompt = f"""
         The player wants to: {action}
         
@@ -331,6 +343,15 @@ class GameLoop:
         Current HP: {context['character_stats']['hp']}
         Location: {context['location']}
 
+        What just happened:
+{recent}
+
+        Earlier events that may matter now:
+{relevant}
+
+        Known facts about the world:
+{facts}
+
         Respond as a D&D DM. If this action needs a dice roll, ask for it specifically.
         Otherwise, narrate what happens and present new choices. 
         End with "What will you do?"
@@ -393,6 +414,10 @@ class GameLoop:
         if save == 'y':
             self.game_state.save_game()
 
+        # Saves are written in the background; make sure they are all on disk
+        if not self.game_state.flush_saves():
+            print("Some saves could not be written.")
+
         print("Thanks for playing!")
         self.running = False
 
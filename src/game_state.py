@@ -1,18 +1,116 @@
-import json
-import os
+from collections import deque
 from datetime import datetime
+from types import MappingProxyType
 from .character import Character
+from .history import HistoryStore
+from .retrieval import HISTORY, EventIndex
+from .storage import READ_ERRORS, FileStorage, compact_json
+
+# Fields compared between saves to find what changed (history and world_state are tracked per entry)
+TRACKED_FIELDS = ('session_id', 'player', 'current_location', 'quests', 'last_saved')
+
+
+# Snapshots kept for undo/rewind (the oldest are dropped first)
+UNDO_LIMIT = 100
+
+# Events sent to the AI: the latest few, plus older ones that match the player's action
+RECENT_EVENTS = 5
+RELEVANT_EVENTS = 5
+
+
+class WorldState(dict):
+    """
+    world_state dict with a version that goes up with every change, so snapshots only copy it
+    when it changed. Replace values rather than changing them in place: snapshots share them.
+    """
+    version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self.version += 1
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.version += 1
+        return item
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.version += 1
+        return super().setdefault(key, default)
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+
+class GameSnapshot:
+    """
+    GameState at one moment (see GameState.snapshot). History is recorded as a length and
+    the player as a CharacterSnapshot; world_state is (live dict, version, frozen copy) and
+    the frozen copy is shared by every snapshot taken while the world didn't change.
+    """
+    __slots__ = ('label', 'player', 'character', 'current_location', 'quests',
+                 'history', 'history_length', 'world_state')
+
+    def __init__(self, label, player, character, current_location, quests, history, history_length, world_state):
+        self.label = label
+        self.player = player
+        self.character = character
+        self.current_location = current_location
+        self.quests = quests
+        self.history = history
+        self.history_length = history_length
+        self.world_state = world_state
+
 
 class GameState:
-    def __init__(self):
+    def __init__(self, writer=None, storage=None):
         self.player = None
         self.current_location = ""
         self.world_state = {}
-        self.history = [] # Store all actions/events
+        self.history = HistoryStore() # Store all actions/events (recent ones in memory, older ones on disk)
         self.quests = []
         self.session_id = ""
         self.last_saved = None
 
+        # Search index over history and world_state, brought up to date when it is queried
+        self.index = EventIndex()
+
+        # Snapshots for undo/rewind, oldest first
+        self.snapshots = deque(maxlen=UNDO_LIMIT)
+        self._snapshot_world = None  # (dict, version, frozen copy) from the last snapshot
+
+        # Where saves go (files by default, or e.g. storage.SQLiteStorage); both write in the background
+        self.storage = storage if storage is not None else FileStorage(writer=writer)
+
+        # What the last save/load left in storage, so saves only send what changed
+        self._save_target = None
+        self._saved_history = 0
+        self._saved_encoded = {}
+        self._saved_world = {}
+
+    @property
+    def world_state(self):
+        return self._world_state
+
+    @world_state.setter
+    def world_state(self, world):
+        self._world_state = world if isinstance(world, WorldState) else WorldState(world)
+
     def create_new_game(self, character):
         """Start a new game with a character"""
         self.player = character
@@ -29,12 +127,30 @@ class GameState:
         }
         self.history.append(event)
 
-    def get_context_for_ai(self):
-        """Get game context to send to AI"""
+    def get_recent_history(self, count=5):
+        """The last `count` history events, oldest first"""
+        return self.history.recent(count)
+
+    def get_relevant_context(self, query, count=RELEVANT_EVENTS):
+        """
+        Older history events and world_state entries that best match a query (e.g. the player's
+        action), leaving out the latest RECENT_EVENTS. Returns (events in order, {key: value}).
+        """
+        self.index.sync(self.history, self._world_state)
+        matches = self.index.search(query, count, before=len(self.history) - RECENT_EVENTS)
+        events = [self.history[index] for index in sorted(key for _, source, key in matches if source == HISTORY)]
+        world = {key: self._world_state[key] for _, source, key in matches if source != HISTORY}
+        return events, world
+
+    def get_context_for_ai(self, query=None):
+        """
+        Get game context to send to AI. relevant_history and relevant_world hold the older events
+        and world facts a query relates to (empty without one).
+        """
         context = {
             'character_name': self.player.name if self.player else "Unknown",
             'location': self.current_location,
-            'recent_history': self.history[-5:] if len(self.history) > 5 else self.history,
+            'recent_history': self.get_recent_history(RECENT_EVENTS),
             'character_stats': {
                 'level': self.player.level if self.player else 1, 
                 'race': self.player.race if self.player else "Unknown",
@@ -42,62 +158,225 @@ class GameState:
                 'hp': f"{self.player.hit_points}/{self.player.max_hit_points}" if self.player else "0/0"
             }
         }
+        context['relevant_history'], context['relevant_world'] = \
+            self.get_relevant_context(query) if query else ([], {})
         return context
     
-    def save_game(self, filename=None):
-        """Save the current game state"""
+    """---------------------"""
+    """Snapshots and Undoing"""
+    """---------------------"""
+
+    def snapshot(self, label=None):
+        """
+        Record the current state so it can be undone to (e.g. once per turn, or "combat"
+        before a fight). Only what changed since the last snapshot is copied: history is kept
+        as a length, and the world and the player's abilities/inventory are shared while unchanged.
+        """
+        snapshot = self._capture(label)
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def _capture(self, label):
+        world = self._snapshot_world
+        if world is None or world[0] is not self._world_state or world[1] != self._world_state.version:
+            world = self._snapshot_world = (
+                self._world_state, self._world_state.version, MappingProxyType(dict(self._world_state))
+            )
+
+        return GameSnapshot(
+            label,
+            self.player,
+            self.player.snapshot() if self.player else None,
+            self.current_location,
+            tuple(self.quests),
+            self.history,
+            len(self.history),
+            world
+        )
+
+    def restore(self, snapshot):
+        """
+        Go back to a snapshot: history after it is dropped and only the parts that changed are replaced.
+        Raises ValueError for a snapshot from before the game was loaded (or from another game).
+        """
+        if snapshot.history is not self.history:
+            raise ValueError("Snapshot is not from this game")
+
+        self.player = snapshot.player
+        if snapshot.character is not None:
+            self.player.restore(snapshot.character)
+        self.current_location = snapshot.current_location
+        if tuple(self.quests) != snapshot.quests:
+            self.quests = list(snapshot.quests)
+
+        live, version, frozen = snapshot.world_state
+        if live is not self._world_state or version != self._world_state.version:
+            self.world_state = dict(frozen)
+            self._snapshot_world = (self._world_state, self._world_state.version, frozen)
+
+        self.history.truncate(snapshot.history_length)
+        self.index.truncate(snapshot.history_length)
+        if len(self.history) < self._saved_history:
+            # Storage still has the dropped events, so the next save has to be a full one
+            self._save_target = None
+
+    def undo(self):
+        """Go back to the last snapshot (before the last action); returns False if there is none"""
+        if not self.snapshots:
+            print("Nothing to undo.")
+            return False
+        self.restore(self.snapshots.pop())
+        return True
+
+    def rewind(self, label):
+        """Go back to the last snapshot with a label (e.g. "combat"), dropping every snapshot after it"""
+        for index in range(len(self.snapshots) - 1, -1, -1):
+            if self.snapshots[index].label == label:
+                snapshot = self.snapshots[index]
+                while len(self.snapshots) > index:
+                    self.snapshots.pop()
+                self.restore(snapshot)
+                return True
+        print(f"No snapshot labelled {label}.")
+        return False
+
+    def branch(self, snapshot=None):
+        """
+        New GameState to play out a what-if from now (or from a snapshot), leaving this game as it is.
+        Stored history is shared with this game and the world's values are shared until replaced;
+        the branch saves under its own session id.
+        """
+        if snapshot is None:
+            snapshot = self._capture("branch")
+        elif snapshot.history is not self.history:
+            raise ValueError("Snapshot is not from this game")
+
+        branch = GameState(storage=self.storage)
+        branch.session_id = f"{self.session_id}_branch_{datetime.now().strftime('%H%M%S%f')}"
+        if snapshot.character is not None:
+            branch.player = Character.from_snapshot(snapshot.character, snapshot.player.dice)
+        branch.current_location = snapshot.current_location
+        branch.quests = list(snapshot.quests)
+        branch.world_state = dict(snapshot.world_state[2])
+        branch.history = self.history.fork(snapshot.history_length)
+        return branch
+
+    """------------------"""
+    """Saving and Loading"""
+    """------------------"""
+
+    def save_game(self, filename=None, compact=False):
+        """
+        Save the current game state through the storage backend.
+        After the first save to a target only what changed since the last save is written
+        (new history events, changed fields and world_state keys); compact forces a full save.
+        The backend does its writing in the background, so this returns without touching the disk.
+        """
         if not filename:
-            filename = f"saves/{self.session_id}.json"
+            filename = self.storage.default_target(self.session_id)
+
+        self.last_saved = datetime.now().isoformat()
+        full = compact or filename != self._save_target or len(self.history) < self._saved_history
+        changes = None if full else self._changes()
+
+        state = self._saved_fields()
+        state['world_state'] = self.world_state
+        self.storage.save(filename, state, self.history, changes)
+        self._mark_saved(filename, state)
 
-        # Create saves directory if it doesn't exist
-        os.makedirs('saves', exist_ok=True)
+        print(f"Game saved to {filename}")
+
+    def flush_saves(self, timeout=None):
+        """Wait until every save so far is safely on disk (e.g. before quitting)"""
+        return self.storage.flush(timeout)
 
-        # Convert character to directory
-        character_data = self._character_to_dict(self.player) if self.player else None
+    def compact(self, filename=None):
+        """Write a full save (for file saves, folds the journal into a fresh snapshot)"""
+        self.save_game(filename, compact=True)
 
-        save_data = {
+    def _saved_fields(self):
+        """Top-level state besides history and world_state, as saved"""
+        return {
             'session_id': self.session_id,
-            'player': character_data,
+            'player': self._character_to_dict(self.player) if self.player else None,
             'current_location': self.current_location,
-            'world_state': self.world_state,
-            'history': self.history,
             'quests': self.quests,
-            'last_saved': datetime.now().isoformat(),
+            'last_saved': self.last_saved
         }
 
-        with open(filename, 'w') as f:
-            json.dump(save_data, f, indent=2)
+    def _changes(self):
+        """History events, fields and world_state keys that changed since the last save"""
+        fields = {}
+        for field, value in self._saved_fields().items():
+            if self._saved_encoded.get(field) != compact_json(value):
+                fields[field] = value
 
-        self.last_saved = datetime.now().isoformat()
-        print(f"Game saved to {filename}")
+        world = {}
+        saved_world = self._saved_world
+        for key, value in self.world_state.items():
+            if saved_world.get(key) != compact_json(value):
+                world[key] = value
+
+        return {
+            'events': self.history[self._saved_history:],
+            'fields': fields,
+            'world': world,
+            'world_deleted': [key for key in saved_world if key not in self.world_state]
+        }
+
+    def _mark_saved(self, filename, state):
+        """Remember what was saved so the next save only sends the difference"""
+        self._save_target = filename
+        self._saved_history = len(self.history)
+        self._saved_encoded = {field: compact_json(state.get(field)) for field in TRACKED_FIELDS}
+        self._saved_world = {key: compact_json(value) for key, value in self.world_state.items()}
 
     def load_game(self, filename):
-        """ Load a saved game state"""
+        """
+        Load a saved game state from the storage backend.
+        File saves only read their header up front; history is decoded when it is used.
+        """
         try:
-            with open(filename, 'r') as f:
-                save_data = json.load(f)
-            
+            save_data, history = self.storage.load(filename)
+
             self.session_id = save_data.get('session_id', '')
             self.current_location = save_data.get('current_location', '')
             self.world_state = save_data.get('world_state', {})
-            self.history = save_data.get('history', [])
+            self.history = history if isinstance(history, HistoryStore) else HistoryStore(history)
             self.quests = save_data.get('quests', [])
             self.last_saved = save_data.get('last_saved')
+            self.snapshots.clear()  # They belong to the game that was playing before
+            self.index.warm(self.history)
 
             # Reconstruct character
             character_data = save_data.get('player')
             if character_data:
                 self.player = self._dict_to_character(character_data)
 
+            self._mark_saved(filename, save_data)
+
             print(f"Game loaded from {filename}")
             return True
         
         except FileNotFoundError:
             print(f"Save file {filename} not found.")
             return False
-        except json.JSONDecodeError:
-            print(f"Error reading save file {filename}.")
+        except READ_ERRORS as e:
+            print(f"Error reading save file {filename}: {e}")
             return False
+
+    def load_latest(self):
+        """Load the most recently saved session"""
+        target = self.storage.latest_session()
+        if target is None:
+            print("No saves found.")
+            return False
+        return self.load_game(target)
+
+    def get_saved_history(self, start=0, stop=None, event_type=None):
+        """History straight from storage (e.g. every 'combat' event), without loading the game"""
+        return self.storage.history(self._save_target or self.storage.default_target(self.session_id),
+                                    start, stop, event_type)
         
     def _character_to_dict(self, character):
         """Convert Character object to dictionary for saving"""
@@ -116,7 +395,7 @@ class GameState:
             'speed': character.speed,
             'skill_proficiencies': character.skill_proficiencies,
             'saving_throw_proficiencies': character.saving_throw_proficiencies,
-            'inventory': character.inventory,
+            'inventory': character.inventory.to_list(),
             'equipment': character.equipment,
             'gold': character.gold,
             'silver': character.silver,
@@ -153,16 +432,13 @@ class GameState:
         return character
     
     def list_save_files(self):
-        """List all available save files in saves directory"""
-        save_dir = "saves"
-        if not os.path.exists(save_dir):
-            print("No saves directory found.")
-            return []
-        files = [f for f in os.listdir(save_dir) if f.endswith(".json")]
-        if not files:
+        """List saved sessions (character, level and location come from the storage catalog)"""
+        sessions = self.storage.list_sessions()
+        if not sessions:
             print("No save files found.")
         else:
             print("\n--- Avaliable Save Files ---")
-            for f in files:
-                print(f)
-        return files
\ No newline at end of file
+            for session in sessions:
+                character = f"{session['character_name']}, Level {session['level']} {session['race']} {session['character_class']}"
+                print(f"{session['target']} - {character.strip()} - {session['location']} (saved {session['last_saved']})")
+        return [session['target'] for session in sessions]
@@ -0,0 +1,328 @@
+import json
+import tempfile
+import threading
+from bisect import bisect_right
+import zlib
+from collections import OrderedDict, deque
+from collections.abc import MutableSequence
+
+# Events per compressed history chunk (in save files and the spill file alike)
+CHUNK_SIZE = 256
+
+# Most recent events kept in memory by default
+DEFAULT_CAPACITY = 1000
+
+# Decoded chunks kept around for repeated reads of older events
+DECODED_CHUNKS = 4
+
+# Field order of the compact row an event is stored as
+EVENT_FIELDS = ('timestamp', 'type', 'description')
+
+# Chunks are read, and moved out of the save file, by the save writer thread as well as the game
+_FILE_LOCK = threading.RLock()
+
+
+def encode_events(events):
+    """Compress a list of history events into one chunk"""
+    rows = []
+    for event in events:
+        if len(event) == len(EVENT_FIELDS) and all(field in event for field in EVENT_FIELDS):
+            rows.append([event[field] for field in EVENT_FIELDS])
+        else:
+            rows.append(event)  # Events with other fields are kept as they are
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_events(data):
+    """Inverse of encode_events"""
+    rows = json.loads(zlib.decompress(data).decode('utf-8'))
+    return [dict(zip(EVENT_FIELDS, row)) if isinstance(row, list) else row for row in rows]
+
+
+class HistoryStore(MutableSequence):
+    """
+    Game history with only the most recent events in memory.
+    The newest `capacity` events (up to one chunk more) are held in a deque; older ones are
+    compressed in chunks of CHUNK_SIZE and written to a temporary spill file, or stay in the
+    save file they were loaded from. Older events are still indexable and iterable: a chunk
+    is decoded when read, and only the last few decoded chunks are kept.
+    Appending, truncating and forking are cheap; anything else (inserting, deleting...)
+    rebuilds the store.
+    """
+
+    def __init__(self, events=(), capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._chunks = []  # [event count, file, offset, length], oldest first
+        self._starts = []  # Index of each chunk's first event
+        self._stored = 0  # Events in chunks
+        self._decoded = OrderedDict()  # chunk index -> events, least recently read first
+        self._recent = deque()
+        self._spill = None  # Temporary file for chunks spilled from memory
+        self._source = None  # Save file the first chunks were loaded from
+        self._shared = False  # The spill file is also read by a fork, so only the garbage collector closes it
+        for event in events:
+            self.append(event)
+
+    @classmethod
+    def from_chunks(cls, source, chunks, capacity=DEFAULT_CAPACITY):
+        """History whose older events are (event count, offset, length) chunks of an open save file"""
+        history = cls(capacity=capacity)
+        history._source = source
+        for count, offset, length in chunks:
+            history._add_chunk(count, source, offset, length)
+        return history
+
+    def _add_chunk(self, count, file, offset, length):
+        self._chunks.append([count, file, offset, length])
+        self._starts.append(self._stored)
+        self._stored += count
+
+    def __len__(self):
+        return self._stored + len(self._recent)
+
+    def __repr__(self):
+        return f"HistoryStore({len(self)} events, {len(self._recent)} in memory)"
+
+    def __eq__(self, other):
+        return len(self) == len(other) and list(self) == list(other)
+
+    """--------------"""
+    """Reading Events"""
+    """--------------"""
+
+    def _raw(self, index):
+        return _read_chunk(self._chunks[index])
+
+    def _chunk_events(self, index):
+        events = self._decoded.get(index)
+        if events is None:
+            events = self._decoded[index] = decode_events(self._raw(index))
+            if len(self._decoded) > DECODED_CHUNKS:
+                self._decoded.popitem(last=False)
+        else:
+            self._decoded.move_to_end(index)
+        return events
+
+    def _event(self, index):
+        if index >= self._stored:
+            return self._recent[index - self._stored]
+        # Chunks are in order, so find the last one starting at or before the index
+        chunk = bisect_right(self._starts, index) - 1
+        return self._chunk_events(chunk)[index - self._starts[chunk]]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._event(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return self._event(index)
+
+    def __iter__(self):
+        for index in range(len(self._chunks)):
+            # Decoded directly so a full pass doesn't churn the cache of recently read chunks
+            yield from self._decoded.get(index) or decode_events(self._raw(index))
+        yield from list(self._recent)
+
+    def recent(self, count=5):
+        """The last `count` events, oldest first"""
+        if count <= 0:
+            return []
+        if count <= len(self._recent):
+            return list(self._recent)[-count:]
+        return self[-count:]
+
+    def find(self, event_type=None, text=None, start=0):
+        """Iterate events from index `start` of one type and/or containing some text"""
+        text = text.lower() if text else None
+        for event in self[start:] if start else self:
+            if event_type is not None and event.get('type') != event_type:
+                continue
+            if text is not None and text not in str(event.get('description', '')).lower():
+                continue
+            yield event
+
+    """-------------"""
+    """Adding Events"""
+    """-------------"""
+
+    def append(self, event):
+        self._recent.append(event)
+        if len(self._recent) >= self.capacity + CHUNK_SIZE:
+            self._spill_oldest()
+
+    def _spill_oldest(self):
+        """Compress the oldest CHUNK_SIZE in-memory events into the spill file"""
+        events = [self._recent.popleft() for _ in range(CHUNK_SIZE)]
+        self._write_spill(len(events), encode_events(events))
+
+    def _write_spill(self, count, data):
+        offset = self._append_to_spill(data)
+        self._add_chunk(count, self._spill, offset, len(data))
+
+    def _append_to_spill(self, data):
+        """Write a compressed chunk at the end of the spill file and return its offset"""
+        with _FILE_LOCK:
+            if self._spill is None:
+                self._spill = tempfile.TemporaryFile()
+            self._spill.seek(0, 2)
+            offset = self._spill.tell()
+            self._spill.write(data)
+            return offset
+
+    def _rebuild(self, events):
+        old_files = (self._source, self._spill if not self._shared else None)
+        self.__init__(events, self.capacity)
+        for file in old_files:
+            if file is not None:
+                file.close()
+
+    def truncate(self, length):
+        """
+        Drop every event from index `length` on (rewinding to an earlier point).
+        Costs the number of dropped events, plus decoding one chunk when cutting into stored ones.
+        """
+        if length >= len(self):
+            return
+        if length >= self._stored:
+            for _ in range(len(self) - length):
+                self._recent.pop()
+            return
+
+        # The chunk the cut falls in comes back into memory; later chunks are dropped
+        # (their bytes stay in the spill file until it is closed)
+        chunk = bisect_right(self._starts, length) - 1
+        kept = self._chunk_events(chunk)[:length - self._starts[chunk]]
+        self._stored = self._starts[chunk]
+        del self._chunks[chunk:]
+        del self._starts[chunk:]
+        for index in [index for index in self._decoded if index >= chunk]:
+            del self._decoded[index]
+        self._recent = deque(kept)
+
+    def fork(self, length=None):
+        """
+        Independent store holding the first `length` events (all by default), e.g. for a branch.
+        Chunks in the spill file are shared rather than copied. Chunks still in the save file are
+        copied to the fork's own spill file, since this store closes the save file when it saves
+        (so the file can be replaced, which Windows refuses while it is open).
+        """
+        if length is None:
+            length = len(self)
+        fork = HistoryStore(capacity=self.capacity)
+        with _FILE_LOCK:
+            for index, (count, file, offset, length_in_file) in enumerate(self._chunks):
+                if self._starts[index] >= length:
+                    break
+                if file is self._source:
+                    fork._write_spill(count, self._raw(index))
+                else:
+                    fork._add_chunk(count, file, offset, length_in_file)
+        if self._spill is not None and any(chunk[1] is self._spill for chunk in fork._chunks):
+            fork._shared = self._shared = True
+        if length > self._stored:
+            fork._recent = deque(self._recent)
+        fork.truncate(length)
+        return fork
+
+    def __setitem__(self, index, event):
+        events = list(self)
+        events[index] = event
+        self._rebuild(events)
+
+    def __delitem__(self, index):
+        events = list(self)
+        del events[index]
+        self._rebuild(events)
+
+    def insert(self, index, event):
+        if index >= len(self):
+            self.append(event)
+            return
+        events = list(self)
+        events.insert(index, event)
+        self._rebuild(events)
+
+    """------"""
+    """Saving"""
+    """------"""
+
+    def save_view(self):
+        """
+        The history as it is now, for saving on another thread while play goes on.
+        Takes no disk I/O: it holds the stored chunks' places and a copy of the in-memory events.
+        """
+        with _FILE_LOCK:
+            return HistoryView(self, list(self._chunks), list(self._recent))
+
+    def compressed_chunks(self):
+        """(event count, compressed bytes) for every event (see HistoryView.compressed_chunks)"""
+        return self.save_view().compressed_chunks()
+
+    def close(self):
+        """Close the save and spill files (the store can't read older events afterwards)"""
+        for file in (self._source, self._spill if not self._shared else None):
+            if file is not None:
+                file.close()
+        self._source = self._spill = None
+
+
+class HistoryView:
+    """A HistoryStore's events at the moment HistoryStore.save_view() was called"""
+
+    def __init__(self, store, chunks, recent):
+        self.store = store
+        self.chunks = chunks  # The store's [event count, file, offset, length] entries
+        self.recent = recent
+
+    def __len__(self):
+        return sum(chunk[0] for chunk in self.chunks) + len(self.recent)
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from decode_events(_read_chunk(chunk))
+        yield from self.recent
+
+    def compressed_chunks(self):
+        """
+        (event count, compressed bytes) for every event: stored chunks are copied as they are,
+        in-memory events are compressed in CHUNK_SIZE pieces. Chunks still read from a save
+        file move to the spill file and the save file is closed, so it can be replaced by the
+        new save.
+        """
+        store = self.store
+        chunks = []
+        for chunk in self.chunks:
+            with _FILE_LOCK:
+                data = _read_chunk(chunk)
+                if chunk[1] is not None and chunk[1] is store._source:
+                    chunk[2] = store._append_to_spill(data)
+                    chunk[1] = store._spill
+            chunks.append((chunk[0], data))
+
+        with _FILE_LOCK:
+            if store._source is not None:
+                store._source.close()
+                store._source = None
+
+        for start in range(0, len(self.recent), CHUNK_SIZE):
+            events = self.recent[start:start + CHUNK_SIZE]
+            chunks.append((len(events), encode_events(events)))
+        return chunks
+
+
+def _read_chunk(chunk):
+    with _FILE_LOCK:
+        _, file, offset, length = chunk
+        file.seek(offset)
+        return file.read(length)
+
+
+def compress_history(history):
+    """(event count, compressed bytes) chunks for any history sequence"""
+    if isinstance(history, (HistoryStore, HistoryView)):
+        return history.compressed_chunks()
+    history = list(history)
+    return [(len(history[start:start + CHUNK_SIZE]), encode_events(history[start:start + CHUNK_SIZE]))
+            for start in range(0, len(history), CHUNK_SIZE)]
@@ -0,0 +1,118 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+
+
+class InitiativeEntry:
+    """One combatant's place in the initiative order"""
+    __slots__ = ('name', 'initiative', 'dex_modifier', 'combatant', 'key')
+
+    def __init__(self, name, initiative, dex_modifier, combatant, key):
+        self.name = name
+        self.initiative = initiative
+        self.dex_modifier = dex_modifier
+        self.combatant = combatant
+        self.key = key
+
+    def to_dict(self):
+        """Same shape as the entries CombatSystem.roll_initiative returns"""
+        return {'name': self.name, 'initiative': self.initiative, 'character': self.combatant}
+
+
+class InitiativeTracker:
+    """
+    Initiative order kept sorted as combatants join, leave or change their initiative.
+    Entries are ordered by initiative, then DEX modifier, then the order they were added,
+    so ties always resolve the same way. Binary search finds every position; nothing is
+    ever re-rolled or re-sorted.
+    """
+
+    def __init__(self):
+        self._keys = []  # Sorted sort keys, best initiative first
+        self._entries = {}  # key -> InitiativeEntry
+        self._sequence = count()
+        self._current = None  # Key of the entry whose turn it is
+        self._moved = set()  # Keys of entries that moved during their turn this round
+        self.round = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        """Entries in turn order"""
+        entries = self._entries
+        for key in self._keys:
+            yield entries[key]
+
+    def __contains__(self, entry):
+        return entry.key in self._entries and self._entries[entry.key] is entry
+
+    def _make_key(self, initiative, dex_modifier, sequence=None):
+        # Negated so that ascending key order is highest initiative first
+        if sequence is None:
+            sequence = next(self._sequence)
+        return (-initiative, -dex_modifier, sequence)
+
+    def add(self, combatant, initiative, dex_modifier=0, name=None):
+        """Add a combatant (joining, summoned...) at the given initiative and return its entry"""
+        if name is None:
+            name = combatant['name'] if isinstance(combatant, dict) else getattr(combatant, 'name', str(combatant))
+        key = self._make_key(initiative, dex_modifier)
+        entry = InitiativeEntry(name, initiative, dex_modifier, combatant, key)
+        insort(self._keys, key)
+        self._entries[key] = entry
+        return entry
+
+    def remove(self, entry):
+        """Remove a combatant (died, fled...). The turn order carries on from where it was."""
+        index = bisect_left(self._keys, entry.key)
+        if index < len(self._keys) and self._keys[index] == entry.key:
+            del self._keys[index]
+            del self._entries[entry.key]
+
+    def move(self, entry, initiative):
+        """
+        Change a combatant's initiative (delay, ready...) keeping its tie-break.
+        Moving the combatant whose turn it is ends that turn: the order carries on from its old
+        place, and its next turn comes at the new place in the following round.
+        """
+        moving_current = entry.key == self._current
+        self.remove(entry)
+        entry.initiative = initiative
+        entry.key = self._make_key(initiative, entry.dex_modifier, entry.key[2])
+        insort(self._keys, entry.key)
+        self._entries[entry.key] = entry
+        if moving_current:
+            self._moved.add(entry.key)
+
+    @property
+    def current(self):
+        """Entry whose turn it is, or None before the first turn (or if it was removed)"""
+        return self._entries.get(self._current)
+
+    def next_turn(self):
+        """Advance to the next combatant, starting a new round after the last one"""
+        if not self._keys:
+            return None
+
+        keys = self._keys
+        index = 0 if self._current is None else bisect_right(keys, self._current)
+        while index < len(keys) and keys[index] in self._moved:
+            index += 1
+        if self._current is None or index == len(keys):
+            index = 0
+            self.round += 1
+            self._moved.clear()
+        self._current = keys[index]
+        return self._entries[self._current]
+
+    def turns(self, max_rounds=None):
+        """Yield entries turn by turn until the order is empty or max_rounds have passed"""
+        while self._keys:
+            entry = self.next_turn()
+            if max_rounds is not None and self.round > max_rounds:
+                return
+            yield entry
+
+    def order(self):
+        """Initiative order as a list of dicts (name, initiative, character)"""
+        return [entry.to_dict() for entry in self]
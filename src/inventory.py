@@ -0,0 +1,234 @@
+from collections import Counter
+
+# Equipment slots: "weapons" holds several items, the others hold one
+EQUIPMENT_SLOTS = ('armor', 'weapons', 'shield')
+MULTI_SLOTS = ('weapons',)
+
+
+class ItemStack:
+    """All copies of one item: quantity plus the per-unit weight (lb) and value (gp)"""
+    __slots__ = ('item_id', 'quantity', 'weight', 'value')
+
+    def __init__(self, item_id, quantity=1, weight=0, value=0):
+        self.item_id = item_id
+        self.quantity = quantity
+        self.weight = weight
+        self.value = value
+
+    @property
+    def total_weight(self):
+        return self.quantity * self.weight
+
+    @property
+    def total_value(self):
+        return self.quantity * self.value
+
+    def to_dict(self):
+        return {'id': self.item_id, 'quantity': self.quantity, 'weight': self.weight, 'value': self.value}
+
+
+class Inventory:
+    """
+    Items stacked by id, with equipment slots and running weight/value totals.
+    Lookups, adds and removes are dict operations and the totals are adjusted as items
+    come and go, so encumbrance and wealth never need a pass over the whole inventory.
+    Iterating yields item ids and `in` checks an id, like the plain list it replaces.
+    `version` goes up with every change, so snapshots can tell when they need a new copy.
+    """
+
+    def __init__(self):
+        self._stacks = {}  # item id -> ItemStack, in the order items were first added
+        self._slots = {slot: [] if slot in MULTI_SLOTS else None for slot in EQUIPMENT_SLOTS}
+        self._equipped = Counter()  # item id -> copies currently equipped
+        self.total_weight = 0
+        self.total_value = 0
+        self.version = 0
+
+    def __len__(self):
+        """Number of different items"""
+        return len(self._stacks)
+
+    def __iter__(self):
+        return iter(self._stacks)
+
+    def __contains__(self, item_id):
+        return item_id in self._stacks
+
+    def __repr__(self):
+        return f"Inventory({len(self._stacks)} items, {self.total_weight} lb, {self.total_value} gp)"
+
+    def stack(self, item_id):
+        return self._stacks.get(item_id)
+
+    def count(self, item_id):
+        stack = self._stacks.get(item_id)
+        return stack.quantity if stack else 0
+
+    def items(self):
+        """(item id, ItemStack) pairs"""
+        return self._stacks.items()
+
+    def add(self, item_id, quantity=1, weight=None, value=None):
+        """
+        Add copies of an item and return its stack.
+        Weight and value are per unit; they are only needed the first time an item is added.
+        """
+        if quantity < 1:
+            raise ValueError(f"Quantity must be at least 1, got {quantity}")
+
+        stack = self._stacks.get(item_id)
+        if stack is None:
+            stack = self._stacks[item_id] = ItemStack(item_id, 0, weight or 0, value or 0)
+        else:
+            # Reprice the copies already carried if a new weight/value is given
+            if weight is not None and weight != stack.weight:
+                self.total_weight += (weight - stack.weight) * stack.quantity
+                stack.weight = weight
+            if value is not None and value != stack.value:
+                self.total_value += (value - stack.value) * stack.quantity
+                stack.value = value
+
+        stack.quantity += quantity
+        self.total_weight += stack.weight * quantity
+        self.total_value += stack.value * quantity
+        self.version += 1
+        return stack
+
+    def remove(self, item_id, quantity=1):
+        """
+        Remove copies of an item (equipped copies that no longer exist are unequipped).
+        Returns False if there are fewer than `quantity` copies.
+        """
+        if quantity < 1:
+            raise ValueError(f"Quantity must be at least 1, got {quantity}")
+
+        stack = self._stacks.get(item_id)
+        if stack is None or stack.quantity < quantity:
+            return False
+
+        stack.quantity -= quantity
+        self.total_weight -= stack.weight * quantity
+        self.total_value -= stack.value * quantity
+        if stack.quantity == 0:
+            del self._stacks[item_id]
+        self.version += 1
+
+        while self._equipped[item_id] > stack.quantity:
+            self._unequip_anywhere(item_id)
+        return True
+
+    """---------"""
+    """Equipment"""
+    """---------"""
+
+    def equip(self, item_id, slot):
+        """
+        Equip a carried item. A single slot swaps out whatever was in it.
+        Raises ValueError for an unknown slot; returns False if no spare copy is carried.
+        """
+        if slot not in self._slots:
+            raise ValueError(f"Invalid equipment slot: {slot}")
+        if self._equipped[item_id] >= self.count(item_id):
+            return False
+
+        if slot in MULTI_SLOTS:
+            self._slots[slot].append(item_id)
+        else:
+            if self._slots[slot] is not None:
+                self._release(self._slots[slot])
+            self._slots[slot] = item_id
+        self._equipped[item_id] += 1
+        self.version += 1
+        return True
+
+    def unequip(self, item_id, slot):
+        """Take an item out of a slot; returns False if it wasn't there"""
+        if slot not in self._slots:
+            raise ValueError(f"Invalid equipment slot: {slot}")
+
+        if slot in MULTI_SLOTS:
+            if item_id not in self._slots[slot]:
+                return False
+            self._slots[slot].remove(item_id)
+        else:
+            if self._slots[slot] != item_id:
+                return False
+            self._slots[slot] = None
+        self._release(item_id)
+        self.version += 1
+        return True
+
+    def _release(self, item_id):
+        self._equipped[item_id] -= 1
+        if not self._equipped[item_id]:
+            del self._equipped[item_id]
+
+    def _unequip_anywhere(self, item_id):
+        for slot in EQUIPMENT_SLOTS:
+            if self.unequip(item_id, slot):
+                return
+
+    def is_equipped(self, item_id):
+        return self._equipped[item_id] > 0
+
+    def equipped(self, slot):
+        """Item id in a single slot, or a list of ids for a multi slot"""
+        items = self._slots[slot]
+        return list(items) if slot in MULTI_SLOTS else items
+
+    @property
+    def equipment(self):
+        """Equipment in the Character.equipment layout: {'armor': id, 'weapons': [ids], 'shield': id}"""
+        return {slot: self.equipped(slot) for slot in EQUIPMENT_SLOTS}
+
+    def load_equipment(self, equipment):
+        """
+        Fill the slots from a saved equipment dict without re-checking the inventory
+        (older saves could equip items that were never in it).
+        """
+        self._slots = {slot: [] if slot in MULTI_SLOTS else None for slot in EQUIPMENT_SLOTS}
+        self._equipped = Counter()
+        for slot in EQUIPMENT_SLOTS:
+            items = (equipment or {}).get(slot)
+            if slot in MULTI_SLOTS:
+                for item_id in items or []:
+                    self._slots[slot].append(item_id)
+                    self._equipped[item_id] += 1
+            elif items is not None:
+                self._slots[slot] = items
+                self._equipped[items] += 1
+        self.version += 1
+
+    def copy(self):
+        """Independent copy (stacks are copied, since their quantities change in place)"""
+        inventory = Inventory()
+        inventory._stacks = {item_id: ItemStack(item_id, stack.quantity, stack.weight, stack.value)
+                             for item_id, stack in self._stacks.items()}
+        inventory._slots = {slot: list(items) if slot in MULTI_SLOTS else items
+                            for slot, items in self._slots.items()}
+        inventory._equipped = Counter(self._equipped)
+        inventory.total_weight = self.total_weight
+        inventory.total_value = self.total_value
+        return inventory
+
+    """-----------"""
+    """Saving Data"""
+    """-----------"""
+
+    def to_list(self):
+        """Stacks as plain dicts for saving"""
+        return [stack.to_dict() for stack in self._stacks.values()]
+
+    @classmethod
+    def from_list(cls, entries):
+        """
+        Rebuild from to_list() output. Plain item names (the old list inventory)
+        are also accepted and stacked as they are read.
+        """
+        inventory = cls()
+        for entry in entries or []:
+            if isinstance(entry, dict):
+                inventory.add(entry['id'], entry.get('quantity', 1), entry.get('weight'), entry.get('value'))
+            else:
+                inventory.add(entry)
+        return inventory
@@ -0,0 +1,179 @@
+from array import array
+from collections import defaultdict
+
+from .combat import ENEMIES, PARTY, Combatant, EncounterResult
+from .dice import DiceRoller, compile_notation
+
+D20_FACES = range(1, 21)
+
+
+class CombatantTable:
+    """
+    Columnar store for large fights: one compact array per stat instead of a dict per creature.
+    Damage is stored as an id into `damage_notations` so creatures sharing a weapon
+    can have their damage rolled in one batch.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.side = array('b')
+        self.hit_points = array('l')
+        self.max_hit_points = array('l')
+        self.armor_class = array('b')
+        self.attack_bonus = array('b')
+        self.damage_id = array('H')
+        self.damage_modifier = array('b')
+        self.dex_modifier = array('b')
+        self.damage_notations = []
+        self._damage_ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_sides(cls, party, enemies):
+        """Build a table from Characters / monster dicts on each side"""
+        table = cls()
+        for member in party:
+            table.add(member, PARTY)
+        for enemy in enemies:
+            table.add(enemy, ENEMIES)
+        return table
+
+    def damage_id_for(self, notation):
+        """Id of a damage notation, registering it the first time it is seen"""
+        notation = compile_notation(notation).notation
+        if notation not in self._damage_ids:
+            self._damage_ids[notation] = len(self.damage_notations)
+            self.damage_notations.append(notation)
+        return self._damage_ids[notation]
+
+    def add(self, source, side):
+        """Add a Character or monster dict to a side and return its row index"""
+        stats = Combatant.from_source(source, side)
+        self.names.append(stats.name)
+        self.side.append(side)
+        self.hit_points.append(stats.hit_points)
+        self.max_hit_points.append(stats.max_hit_points)
+        self.armor_class.append(stats.armor_class)
+        self.attack_bonus.append(stats.attack_bonus)
+        self.damage_id.append(self.damage_id_for(stats.damage.notation))
+        self.damage_modifier.append(stats.damage_modifier)
+        self.dex_modifier.append(stats.dex_modifier)
+        return len(self.names) - 1
+
+    def living(self, side):
+        """Row indexes of creatures on a side that are still standing"""
+        hit_points = self.hit_points
+        return [i for i, s in enumerate(self.side) if s == side and hit_points[i] > 0]
+
+    def total_hit_points(self, side):
+        return sum(hp for hp, s in zip(self.hit_points, self.side) if s == side)
+
+
+class MassBattle:
+    """
+    Resolves a big fight side by side, with group initiative: each round the side that
+    won initiative makes all of its attacks at once, then the other side does.
+    Each creature attacks a random living enemy using the usual attack rules
+    (natural 1 misses, natural 20 crits, minimum 1 damage).
+    """
+
+    def __init__(self, table, dice=None):
+        self.table = table
+        self.dice = dice if dice is not None else DiceRoller()
+        self.damage_dealt = [0, 0]
+        self.rounds = 0
+
+    def resolve_side(self, side):
+        """All living creatures on a side attack at once; returns the damage dealt"""
+        table = self.table
+        rng = self.dice.rng
+        attackers = table.living(side)
+        targets = table.living(1 - side)
+        if not attackers or not targets:
+            return 0
+
+        chosen = rng.choices(targets, k=len(attackers))
+        d20s = rng.choices(D20_FACES, k=len(attackers))
+        attack_bonus = table.attack_bonus
+        armor_class = table.armor_class
+
+        # Group the hits by damage expression so each weapon is rolled in one batch
+        hits = defaultdict(list)
+        for attacker, target, d20 in zip(attackers, chosen, d20s):
+            if d20 == 20 or (d20 != 1 and d20 + attack_bonus[attacker] >= armor_class[target]):
+                hits[table.damage_id[attacker]].append((attacker, target, d20 == 20))
+
+        hit_points = table.hit_points
+        damage_modifier = table.damage_modifier
+        dealt = 0
+        for damage_id, landed in hits.items():
+            expression = compile_notation(table.damage_notations[damage_id])
+            rolls = expression.roll_many(rng, len(landed))
+            crits = [i for i, (_, _, critical) in enumerate(landed) if critical]
+            if crits:
+                # Critical hits roll the damage dice a second time
+                extra = expression.roll_many(rng, len(crits))
+                rolls = list(rolls)
+                for i, roll in zip(crits, extra):
+                    rolls[i] += roll - expression.modifier
+
+            for (attacker, target, _), roll in zip(landed, rolls):
+                damage = max(1, roll + damage_modifier[attacker])
+                hit_points[target] = max(0, hit_points[target] - damage)
+                dealt += damage
+
+        self.damage_dealt[side] += dealt
+        return dealt
+
+    def run(self, max_rounds=100):
+        """Fight until one side is down (or max_rounds) and return an EncounterResult"""
+        table = self.table
+        rand = self.dice.rng.random
+
+        # Group initiative: one d20 per side plus the side's average DEX modifier
+        initiative = []
+        for side in (PARTY, ENEMIES):
+            modifiers = [dex for dex, s in zip(table.dex_modifier, table.side) if s == side]
+            average = sum(modifiers) / len(modifiers) if modifiers else 0
+            initiative.append(int(rand() * 20) + 1 + average)
+        order = (PARTY, ENEMIES) if initiative[PARTY] >= initiative[ENEMIES] else (ENEMIES, PARTY)
+
+        winner = self._winner()
+        while winner is None and self.rounds < max_rounds:
+            self.rounds += 1
+            for side in order:
+                self.resolve_side(side)
+                winner = self._winner()
+                if winner is not None:
+                    break
+
+        return EncounterResult(
+            self.rounds,
+            winner,
+            tuple(name for name, hp in zip(table.names, table.hit_points) if hp > 0),
+            table.total_hit_points(PARTY),
+            table.total_hit_points(ENEMIES),
+            self.damage_dealt[PARTY],
+            self.damage_dealt[ENEMIES]
+        )
+
+    def _winner(self):
+        party_alive = enemies_alive = False
+        for hp, side in zip(self.table.hit_points, self.table.side):
+            if hp > 0:
+                if side == PARTY:
+                    party_alive = True
+                else:
+                    enemies_alive = True
+        if not enemies_alive:
+            return PARTY
+        if not party_alive:
+            return ENEMIES
+        return None
+
+
+def run_mass_battle(party, enemies, dice=None, max_rounds=100):
+    """Build a CombatantTable for both sides and fight it out"""
+    return MassBattle(CombatantTable.from_sides(party, enemies), dice).run(max_rounds)
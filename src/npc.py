@@ -0,0 +1,212 @@
+from types import MappingProxyType
+
+from .character import ABILITIES, CLASS_HIT_DICE, RACIAL_BONUSES, SKILL_ABILITIES
+from .combat import DEFAULT_WEAPON_DAMAGE
+from .content import ASI_CHOICE, DEFAULT_HIT_DIE
+
+
+class NPCTemplate:
+    """
+    Shared, read-only stat block for a kind of NPC (town guard, goblin archer...).
+    Everything that is the same for every copy lives here, including the ability modifiers,
+    saving throws and skills, which are worked out once when the template is built.
+    """
+    __slots__ = ('name', 'race', 'character_class', 'level', 'abilities', 'modifiers',
+                 'proficiency_bonus', 'skill_proficiencies', 'saving_throw_proficiencies',
+                 'saving_throws', 'skills', 'max_hit_points', 'armor_class', 'weapon_damage', 'speed')
+
+    def __init__(self, name, race="", character_class="", level=1, abilities=None,
+                 skill_proficiencies=(), saving_throw_proficiencies=(), hit_points=None,
+                 armor_class=None, weapon_damage=DEFAULT_WEAPON_DAMAGE, speed=30):
+        """
+        Base abilities default to 10 and get the race's ability score increases on top.
+        Hit points default to the max hit die at level 1 plus the fixed average per level
+        after that (CON modifier each level); AC defaults to 10 + DEX modifier.
+        """
+        scores = {ability: 10 for ability in ABILITIES}
+        scores.update(abilities or {})
+        for ability, bonus in RACIAL_BONUSES.get(race.lower(), {}).get('asi', {}).items():
+            if ability != ASI_CHOICE:
+                scores[ability] += bonus
+        modifiers = {ability: (score - 10) // 2 for ability, score in scores.items()}
+
+        proficiency_bonus = 2 + (level - 1) // 4
+        skill_proficiencies = frozenset(skill_proficiencies)
+        saving_throw_proficiencies = frozenset(saving_throw_proficiencies)
+
+        if hit_points is None:
+            hit_die = CLASS_HIT_DICE.get(character_class.lower(), DEFAULT_HIT_DIE)
+            con_mod = modifiers['constitution']
+            hit_points = max(1, hit_die + con_mod + (level - 1) * (hit_die // 2 + 1 + con_mod))
+        if armor_class is None:
+            armor_class = 10 + modifiers['dexterity']
+
+        assign = object.__setattr__
+        assign(self, 'name', name)
+        assign(self, 'race', race)
+        assign(self, 'character_class', character_class)
+        assign(self, 'level', level)
+        assign(self, 'abilities', MappingProxyType(scores))
+        assign(self, 'modifiers', MappingProxyType(modifiers))
+        assign(self, 'proficiency_bonus', proficiency_bonus)
+        assign(self, 'skill_proficiencies', skill_proficiencies)
+        assign(self, 'saving_throw_proficiencies', saving_throw_proficiencies)
+        assign(self, 'saving_throws', MappingProxyType({
+            ability: modifiers[ability] + (proficiency_bonus if ability in saving_throw_proficiencies else 0)
+            for ability in ABILITIES
+        }))
+        assign(self, 'skills', MappingProxyType({
+            skill: modifiers[ability] + (proficiency_bonus if skill in skill_proficiencies else 0)
+            for skill, ability in SKILL_ABILITIES.items()
+        }))
+        assign(self, 'max_hit_points', hit_points)
+        assign(self, 'armor_class', armor_class)
+        assign(self, 'weapon_damage', weapon_damage)
+        assign(self, 'speed', speed)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NPCTemplate is read-only; build a new template instead")
+
+    def __delattr__(self, name):
+        raise AttributeError("NPCTemplate is read-only; build a new template instead")
+
+    def __reduce__(self):
+        # Slots can't be restored through the read-only __setattr__ (and mapping proxies don't
+        # pickle), so rebuild from plain copies of the slot values
+        values = tuple(getattr(self, slot) for slot in self.__slots__)
+        return _restore_template, (tuple(dict(value) if isinstance(value, MappingProxyType) else value
+                                         for value in values),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"NPCTemplate({self.name!r}, level {self.level} {self.race} {self.character_class})"
+
+    @classmethod
+    def from_character(cls, character, name=None, weapon_damage=None):
+        """Template with a Character's current stats (racial bonuses are already in its scores)"""
+        template = cls(
+            name or character.name,
+            "",
+            character.character_class,
+            character.level,
+            dict(character.abilities),
+            character.skill_proficiencies,
+            character.saving_throw_proficiencies,
+            max(character.max_hit_points, 1),
+            character.armor_class,
+            weapon_damage or getattr(character, 'weapon_damage', DEFAULT_WEAPON_DAMAGE),
+            character.speed
+        )
+        object.__setattr__(template, 'race', character.race)
+        return template
+
+    def spawn(self, name=None):
+        """One NPC at full health"""
+        return NPC(self, name)
+
+    def spawn_many(self, count, name_format="{name} {number}"):
+        """`count` NPCs named from name_format (fields: name, number starting at 1)"""
+        return [NPC(self, name_format.format(name=self.name, number=number))
+                for number in range(1, count + 1)]
+
+
+def _restore_template(values):
+    template = object.__new__(NPCTemplate)
+    for slot, value in zip(NPCTemplate.__slots__, values):
+        object.__setattr__(template, slot, MappingProxyType(value) if isinstance(value, dict) else value)
+    return template
+
+
+def _shared(attribute):
+    """Read-only NPC attribute that comes from its template"""
+    return property(lambda self: getattr(self.template, attribute))
+
+
+class NPC:
+    """
+    Lightweight creature built from a shared NPCTemplate.
+    Only its name, current hit points and conditions are stored per instance; every other
+    stat is read from the template. Offers the attributes and methods CombatSystem uses on
+    a Character (name, hit points, armor_class, proficiency_bonus, get_ability_modifier...).
+    """
+    __slots__ = ('template', 'name', 'hit_points', 'conditions')
+
+    def __init__(self, template, name=None, hit_points=None):
+        self.template = template
+        self.name = name if name is not None else template.name
+        self.hit_points = template.max_hit_points if hit_points is None else hit_points
+        self.conditions = None  # Set of condition names, created when the first one is added
+
+    def __repr__(self):
+        return f"NPC({self.name!r}, {self.hit_points}/{self.max_hit_points} HP)"
+
+    # Stats shared through the template
+    race = _shared('race')
+    character_class = _shared('character_class')
+    level = _shared('level')
+    abilities = _shared('abilities')
+    proficiency_bonus = _shared('proficiency_bonus')
+    skill_proficiencies = _shared('skill_proficiencies')
+    saving_throw_proficiencies = _shared('saving_throw_proficiencies')
+    saving_throws = _shared('saving_throws')
+    skills = _shared('skills')
+    max_hit_points = _shared('max_hit_points')
+    armor_class = _shared('armor_class')
+    weapon_damage = _shared('weapon_damage')
+    speed = _shared('speed')
+
+    @property
+    def is_alive(self):
+        return self.hit_points > 0
+
+    def get_ability_modifier(self, ability):
+        return self.template.modifiers.get(ability, 0)
+
+    def calculate_saving_throw(self, ability):
+        return self.template.saving_throws.get(ability, 0)
+
+    def calculate_skill(self, skill):
+        skills = self.template.skills
+        if skill in skills:
+            return skills[skill]
+        # Unknown skills fall back to INT, as on a Character
+        proficiency = self.proficiency_bonus if skill in self.skill_proficiencies else 0
+        return self.get_ability_modifier('intelligence') + proficiency
+
+    def take_damage(self, amount):
+        """Lose hit points (never below 0) and return the hit points left"""
+        self.hit_points = max(0, self.hit_points - amount)
+        return self.hit_points
+
+    def heal(self, amount):
+        """Regain hit points (never above the maximum) and return the hit points left"""
+        self.hit_points = min(self.max_hit_points, self.hit_points + amount)
+        return self.hit_points
+
+    def add_condition(self, condition):
+        if self.conditions is None:
+            self.conditions = set()
+        self.conditions.add(condition)
+
+    def remove_condition(self, condition):
+        if self.conditions:
+            self.conditions.discard(condition)
+            if not self.conditions:
+                self.conditions = None
+
+    def has_condition(self, condition):
+        return bool(self.conditions) and condition in self.conditions
+
+    def to_dict(self):
+        """Per-instance state plus the template name it was spawned from"""
+        return {
+            'template': self.template.name,
+            'name': self.name,
+            'hit_points': self.hit_points,
+            'conditions': sorted(self.conditions or ())
+        }
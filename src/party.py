@@ -0,0 +1,224 @@
+from array import array
+from collections import defaultdict
+
+from .character import ABILITIES, SKILL_ABILITIES
+from .dice import DiceRoller, compile_notation
+from .probability import distribution
+
+# d20 notations for a normal roll, advantage and disadvantage
+NORMAL = "1d20"
+ADVANTAGE = "1d20adv"
+DISADVANTAGE = "1d20dis"
+
+# Passive scores are 10 + modifier, with +5 for advantage and -5 for disadvantage
+PASSIVE_BASE = 10
+PASSIVE_ADJUSTMENT = {NORMAL: 0, ADVANTAGE: 5, DISADVANTAGE: -5}
+
+
+def _success_counts(probabilities):
+    """counts[k] = chance that exactly k members succeed (independent, unequal chances)"""
+    counts = [1.0]
+    for p in probabilities:
+        step = [0.0] * (len(counts) + 1)
+        for k, chance in enumerate(counts):
+            step[k] += chance * (1.0 - p)
+            step[k + 1] += chance * p
+        counts = step
+    return counts
+
+
+class PartyCheck:
+    """
+    Result of one check or save made by the whole party against a DC.
+    Columns line up with the party's members: rolls, modifiers, totals, successes and
+    each member's chance of success before the dice were rolled.
+    """
+    __slots__ = ('kind', 'dc', 'names', 'rolls', 'modifiers', 'totals', 'successes',
+                 'probabilities', 'damage')
+
+    def __init__(self, kind, dc, names, rolls, modifiers, successes, probabilities, damage=None):
+        self.kind = kind  # Skill or ability name
+        self.dc = dc
+        self.names = names
+        self.rolls = rolls
+        self.modifiers = modifiers
+        self.totals = array('l', [roll + modifier for roll, modifier in zip(rolls, modifiers)])
+        self.successes = successes
+        self.probabilities = probabilities
+        self.damage = damage  # Damage each member takes, for area saves
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def passed(self):
+        return sum(self.successes)
+
+    @property
+    def group_success(self):
+        """5e group check: the party succeeds if at least half of its members do"""
+        return self.passed * 2 >= len(self.names)
+
+    @property
+    def expected_successes(self):
+        return sum(self.probabilities)
+
+    @property
+    def group_success_chance(self):
+        """Chance, before rolling, that at least half of the party succeeds"""
+        needed = (len(self.names) + 1) // 2
+        return sum(_success_counts(self.probabilities)[needed:])
+
+    def results(self):
+        """One dict per member"""
+        results = []
+        for i, name in enumerate(self.names):
+            result = {
+                'name': name,
+                'roll': self.rolls[i],
+                'modifier': self.modifiers[i],
+                'total': self.totals[i],
+                'success': self.successes[i],
+                'probability': self.probabilities[i]
+            }
+            if self.damage is not None:
+                result['damage'] = self.damage[i]
+            results.append(result)
+        return results
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'dc': self.dc,
+            'passed': self.passed,
+            'group_success': self.group_success,
+            'group_success_chance': self.group_success_chance,
+            'members': self.results()
+        }
+
+
+class Party:
+    """
+    A group of Characters (or NPCs) making checks and saves together.
+    Each skill's and save's modifiers are gathered into one array the first time they are
+    needed, and every roll for the party is made in a single batch. Call refresh() after
+    members level up or their scores or proficiencies change.
+    """
+
+    def __init__(self, members=None, dice=None):
+        self.members = list(members or [])
+        self.dice = dice if dice is not None else DiceRoller()
+        self._skill_modifiers = {}  # skill -> array of member modifiers
+        self._save_modifiers = {}  # ability -> array of member modifiers
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    @property
+    def names(self):
+        return [member.name for member in self.members]
+
+    def add(self, member):
+        self.members.append(member)
+        self.refresh()
+
+    def remove(self, member):
+        if member in self.members:
+            self.members.remove(member)
+            self.refresh()
+
+    def refresh(self):
+        """Drop the cached modifier arrays so they are rebuilt from the members"""
+        self._skill_modifiers.clear()
+        self._save_modifiers.clear()
+
+    def skill_modifiers(self, skill):
+        modifiers = self._skill_modifiers.get(skill)
+        if modifiers is None:
+            modifiers = self._skill_modifiers[skill] = array(
+                'b', [member.calculate_skill(skill) for member in self.members]
+            )
+        return modifiers
+
+    def save_modifiers(self, ability):
+        if ability not in ABILITIES:
+            raise ValueError(f"Unknown ability: {ability}")
+        modifiers = self._save_modifiers.get(ability)
+        if modifiers is None:
+            modifiers = self._save_modifiers[ability] = array(
+                'b', [member.calculate_saving_throw(ability) for member in self.members]
+            )
+        return modifiers
+
+    def _member_rolls(self, roll):
+        """A d20 notation per member: one for everyone, or a list (one per member)"""
+        if isinstance(roll, str):
+            return [roll] * len(self.members)
+        if len(roll) != len(self.members):
+            raise ValueError(f"Expected {len(self.members)} rolls, got {len(roll)}")
+        return list(roll)
+
+    def _resolve(self, kind, modifiers, dc, roll):
+        """Roll for every member in one batch per notation and work out each chance of success"""
+        notations = self._member_rolls(roll)
+        by_notation = defaultdict(list)
+        for i, notation in enumerate(notations):
+            by_notation[notation].append(i)
+
+        rolls = array('l', [0] * len(notations))
+        rng = self.dice.rng
+        for notation, indices in by_notation.items():
+            for i, value in zip(indices, compile_notation(notation).roll_many(rng, len(indices))):
+                rolls[i] = value
+
+        # Checks and saves have no automatic success on a natural 20 (or failure on a 1)
+        successes = [value + modifier >= dc for value, modifier in zip(rolls, modifiers)]
+        probabilities = [distribution(notation).prob_at_least(dc - modifier)
+                         for notation, modifier in zip(notations, modifiers)]
+        return PartyCheck(kind, dc, self.names, rolls, modifiers, successes, probabilities)
+
+    def group_check(self, skill, dc, roll=NORMAL):
+        """
+        Everyone makes the same skill check (sneaking past a guard, climbing a cliff).
+        roll is "1d20", "1d20adv", "1d20dis", or a list with one of those per member.
+        """
+        if skill not in SKILL_ABILITIES:
+            raise ValueError(f"Unknown skill: {skill}")
+        return self._resolve(skill, self.skill_modifiers(skill), dc, roll)
+
+    def saving_throw(self, ability, dc, roll=NORMAL):
+        """Everyone makes the same saving throw"""
+        return self._resolve(ability, self.save_modifiers(ability), dc, roll)
+
+    def area_save(self, ability, dc, damage, roll=NORMAL, half_on_success=True, apply=False):
+        """
+        Saving throw against an area effect (fireball, falling rocks...).
+        The damage is rolled once for everyone, as in 5e; members who save take half (or none
+        when half_on_success is False). With apply set, the damage comes off their hit points.
+        """
+        check = self.saving_throw(ability, dc, roll)
+        amount = self.dice.roll_total(damage)
+        saved_amount = amount // 2 if half_on_success else 0
+        check.damage = [saved_amount if success else amount for success in check.successes]
+
+        if apply:
+            for member, taken in zip(self.members, check.damage):
+                member.hit_points = max(0, member.hit_points - taken)
+        return check
+
+    def passive_scores(self, skill, roll=NORMAL):
+        """Passive score per member (e.g. passive Perception), as an array"""
+        adjustments = [PASSIVE_ADJUSTMENT.get(notation, 0) for notation in self._member_rolls(roll)]
+        return array('l', [PASSIVE_BASE + modifier + adjustment
+                           for modifier, adjustment in zip(self.skill_modifiers(skill), adjustments)])
+
+    def passive_check(self, skill, dc, roll=NORMAL):
+        """Which members notice something without rolling (passive score >= DC)"""
+        scores = self.passive_scores(skill, roll)
+        modifiers = array('b', [score - PASSIVE_BASE for score in scores])
+        successes = [score >= dc for score in scores]
+        return PartyCheck(skill, dc, self.names, array('l', [PASSIVE_BASE] * len(scores)), modifiers,
+                          successes, [1.0 if success else 0.0 for success in successes])
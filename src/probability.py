@@ -0,0 +1,217 @@
+from functools import lru_cache
+from math import comb, sqrt
+
+from .dice import MAX_EXPLOSIONS, compile_notation
+
+# Exploding dice can in theory go on forever; chains less likely than this are ignored
+EXPLOSION_EPSILON = 1e-18
+
+
+class DiceDistribution:
+    """
+    Exact probability mass function of a dice expression.
+    probs[i] is the chance of rolling a total of (minimum + i).
+    """
+    __slots__ = ('minimum', 'probs', '_cumulative')
+
+    def __init__(self, minimum, weights):
+        # Trim impossible totals off both ends so minimum/maximum are real outcomes
+        start = 0
+        end = len(weights)
+        while start < end and not weights[start]:
+            start += 1
+        while end > start and not weights[end - 1]:
+            end -= 1
+
+        total_weight = sum(weights[start:end])
+        self.minimum = minimum + start
+        self.probs = tuple(weight / total_weight for weight in weights[start:end])
+
+        cumulative = []
+        running = 0.0
+        for prob in self.probs:
+            running += prob
+            cumulative.append(running)
+        self._cumulative = tuple(cumulative)
+
+    @property
+    def maximum(self):
+        return self.minimum + len(self.probs) - 1
+
+    @property
+    def mean(self):
+        """Expected value of the total"""
+        return sum((self.minimum + i) * prob for i, prob in enumerate(self.probs))
+
+    @property
+    def variance(self):
+        mean = self.mean
+        return sum((self.minimum + i - mean) ** 2 * prob for i, prob in enumerate(self.probs))
+
+    @property
+    def std_dev(self):
+        return sqrt(self.variance)
+
+    def prob(self, total):
+        """P(roll == total)"""
+        index = total - self.minimum
+        if 0 <= index < len(self.probs):
+            return self.probs[index]
+        return 0.0
+
+    def cdf(self, total):
+        """P(roll <= total)"""
+        index = total - self.minimum
+        if index < 0:
+            return 0.0
+        if index >= len(self._cumulative):
+            return 1.0
+        return self._cumulative[index]
+
+    def prob_at_least(self, target):
+        """P(roll >= target), e.g. the chance to meet a DC"""
+        return 1.0 - self.cdf(target - 1)
+
+    def convolve(self, other):
+        """Distribution of the sum of this roll and an independent other roll"""
+        return DiceDistribution(self.minimum + other.minimum, _convolve(self.probs, other.probs))
+
+    def shift(self, offset):
+        """Distribution with a flat modifier added"""
+        return DiceDistribution(self.minimum + offset, self.probs)
+
+    def clamp(self, floor):
+        """Distribution of max(floor, roll), e.g. the minimum 1 damage rule"""
+        if self.minimum >= floor:
+            return self
+        below = floor - self.minimum
+        if below >= len(self.probs):
+            return DiceDistribution(floor, [1])
+        return DiceDistribution(floor, [sum(self.probs[:below + 1])] + list(self.probs[below + 1:]))
+
+    def items(self):
+        """(total, probability) pairs in ascending order of total"""
+        return [(self.minimum + i, prob) for i, prob in enumerate(self.probs)]
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+def mixture(weighted):
+    """Combine (probability, DiceDistribution) pairs into one distribution"""
+    weighted = [(chance, dist) for chance, dist in weighted if chance > 0]
+    minimum = min(dist.minimum for _, dist in weighted)
+    maximum = max(dist.maximum for _, dist in weighted)
+    weights = [0.0] * (maximum - minimum + 1)
+    for chance, dist in weighted:
+        offset = dist.minimum - minimum
+        for i, prob in enumerate(dist.probs):
+            weights[offset + i] += chance * prob
+    return DiceDistribution(minimum, weights)
+
+
+def _convolve(first, second):
+    """Convolve two weight lists (the distribution of the sum of both)"""
+    result = [0] * (len(first) + len(second) - 1)
+    for i, a in enumerate(first):
+        if not a:
+            continue
+        for j, b in enumerate(second):
+            result[i + j] += a * b
+    return result
+
+
+def _die_weights(term):
+    """Weights for a single die of the term as (lowest face, weights)"""
+    sides = term.sides
+    if not term.explode:
+        return 1, [1] * sides
+
+    # Value k*sides + r means k explosions followed by a non-maximum face r.
+    # The roller stops exploding after MAX_EXPLOSIONS, so the last face is kept whatever it is.
+    weights = [0.0] * sides
+    chance = 1.0 / sides
+    for explosions in range(MAX_EXPLOSIONS + 1):
+        last = explosions == MAX_EXPLOSIONS or chance / sides < EXPLOSION_EPSILON
+        faces = sides if last else sides - 1
+        for face in range(1, faces + 1):
+            weights[explosions * sides + face - 1] = chance
+        if last:
+            break
+        weights.extend([0.0] * sides)
+        chance /= sides
+    return 1, weights
+
+
+def _keep_weights(lowest, die_weights, count, keep, keep_highest):
+    """
+    Weights for the sum of the best (or worst) `keep` of `count` dice.
+    Walks the faces from best to worst, choosing how many dice land on each face;
+    binomial factors count the ways to pick which dice those are.
+    """
+    faces = [(lowest + i, weight) for i, weight in enumerate(die_weights) if weight]
+    if keep_highest:
+        faces.reverse()
+
+    # (dice still unassigned, dice kept so far) -> {sum of kept dice: weight}
+    states = {(count, 0): {0: 1}}
+    for value, weight in faces:
+        next_states = {}
+        for (remaining, kept), sums in states.items():
+            for chosen in range(remaining + 1):
+                factor = comb(remaining, chosen) * weight ** chosen
+                taken = min(chosen, keep - kept)
+                key = (remaining - chosen, kept + taken)
+                bucket = next_states.setdefault(key, {})
+                for total, total_weight in sums.items():
+                    new_total = total + taken * value
+                    bucket[new_total] = bucket.get(new_total, 0) + total_weight * factor
+        states = next_states
+
+    results = {}
+    for (remaining, kept), sums in states.items():
+        if remaining:
+            continue
+        for total, total_weight in sums.items():
+            results[total] = results.get(total, 0) + total_weight
+
+    minimum = min(results)
+    weights = [0] * (max(results) - minimum + 1)
+    for total, total_weight in results.items():
+        weights[total - minimum] = total_weight
+    return minimum, weights
+
+
+def _term_weights(term):
+    """Weights for a whole term, as (lowest total, weights)"""
+    lowest, die_weights = _die_weights(term)
+
+    if term.keep is None:
+        minimum = lowest * term.count
+        weights = die_weights
+        for _ in range(term.count - 1):
+            weights = _convolve(weights, die_weights)
+    else:
+        minimum, weights = _keep_weights(lowest, die_weights, term.count, term.keep, term.keep_highest)
+
+    if term.sign < 0:
+        return -(minimum + len(weights) - 1), weights[::-1]
+    return minimum, weights
+
+
+@lru_cache(maxsize=256)
+def distribution(dice_notation):
+    """
+    Exact distribution of a dice notation, memoized per notation.
+    Examples: distribution("2d6+3").mean, distribution("1d20adv").prob_at_least(15)
+    """
+    expression = compile_notation(dice_notation)
+
+    minimum = expression.modifier
+    weights = [1]
+    for term in expression.terms:
+        term_minimum, term_weights = _term_weights(term)
+        minimum += term_minimum
+        weights = _convolve(weights, term_weights)
+
+    return DiceDistribution(minimum, weights)
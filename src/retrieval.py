@@ -0,0 +1,240 @@
+import heapq
+import json
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+# BM25 parameters: term frequency saturation and document length normalisation
+K1 = 1.2
+B = 0.75
+
+# Terms in more than this share of documents say little about relevance and are skipped
+# (as long as the query has rarer terms)
+COMMON_RATIO = 0.1
+
+# Postings scored per query (split between its terms, newest first), so a search stays
+# fast however long the session runs
+SCAN_BUDGET = 1000
+MIN_POSTINGS = 100
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have he her his i in into is it its me my of on or
+our she that the their them then there they this to was we were what will with you your
+""".split())
+
+# Sources a search result can come from
+HISTORY = 'history'
+WORLD = 'world'
+
+
+def tokenize(text):
+    """Lowercase words and numbers, without stop words and single letters"""
+    return [token for token in TOKEN_PATTERN.findall(str(text).lower())
+            if len(token) > 1 and token not in STOP_WORDS]
+
+
+def world_entry_text(key, value):
+    """Searchable text of a world_state entry (its key counts too, e.g. 'goblin_chief')"""
+    if not isinstance(value, str):
+        value = json.dumps(value)
+    return f"{key} {value}"
+
+
+class EventIndex:
+    """
+    BM25 inverted index over history event descriptions and world_state entries.
+    History is only ever appended to (or cut back by undo), so each term's postings are
+    arrays of event indexes in order, extended as events arrive and trimmed from the end.
+    World entries change in place and are few, so they are re-indexed whenever the
+    world's version moves. sync() brings the index up to date with a game's state;
+    it only does work for what changed since the last call. warm() indexes a loaded
+    history on a background thread, so the first search after loading a long save
+    doesn't have to.
+    """
+
+    def __init__(self):
+        self._history = None  # HistoryStore the events came from
+        self._postings = {}  # term -> (array of event indexes, array of term counts)
+        self._lengths = array('l')  # Tokens per event
+        self._total_length = 0
+
+        self._world = None  # (world_state dict, version) last indexed
+        self._world_postings = {}  # term -> {key: term count}
+        self._world_lengths = {}  # key -> tokens
+        self._world_total = 0
+
+        self._warming = None  # (thread, history, [index built from it, or None if it failed])
+
+    def __len__(self):
+        return len(self._lengths) + len(self._world_lengths)
+
+    """--------"""
+    """Indexing"""
+    """--------"""
+
+    def warm(self, history):
+        """Start indexing a history's stored events on a background thread (e.g. after loading)"""
+        view = history.save_view() if hasattr(history, 'save_view') else None
+        if view is None or not view.chunks:
+            return  # Small enough for the next sync to index
+        self.clear()
+        result = []
+        thread = threading.Thread(target=self._build, args=(view, result), daemon=True)
+        self._warming = (thread, history, result)
+        thread.start()
+
+    @staticmethod
+    def _build(view, result):
+        index = EventIndex()
+        try:
+            for event in view:
+                index.add_event(event)
+        except (OSError, ValueError):
+            index = None  # The history's files were closed or replaced; sync() indexes it instead
+        result.append(index)
+
+    def _finish_warming(self):
+        """Wait for warm() to finish and take over what it indexed"""
+        thread, history, result = self._warming
+        self._warming = None
+        thread.join()
+        built = result[0] if result else None
+        if built is not None:  # sync() and truncate() cut it back if history was since truncated
+            self._history = history
+            self._postings = built._postings
+            self._lengths = built._lengths
+            self._total_length = built._total_length
+
+    def sync(self, history, world_state=None):
+        """Index events added to history (and world_state changes) since the last sync"""
+        if self._warming is not None:
+            self._finish_warming()
+        if history is not self._history:
+            self.clear()
+            self._history = history
+        if len(history) < len(self._lengths):
+            self.truncate(len(history))
+        for event in history[len(self._lengths):]:
+            self.add_event(event)
+
+        if world_state is not None:
+            # A plain dict has no version, so it is re-indexed every time
+            version = getattr(world_state, 'version', None)
+            if version is None or self._world is None or self._world[0] is not world_state \
+                    or self._world[1] != version:
+                self._index_world(world_state)
+                self._world = (world_state, version)
+
+    def add_event(self, event):
+        """Index the next history event"""
+        index = len(self._lengths)
+        tokens = tokenize(event.get('description', '')) if isinstance(event, dict) else []
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('l'), array('l'))
+            postings[0].append(index)
+            postings[1].append(count)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+
+    def truncate(self, length):
+        """Forget events from index `length` on (after an undo or rewind)"""
+        if self._warming is not None:
+            self._finish_warming()
+        if length >= len(self._lengths):
+            return
+        emptied = []
+        for term, (indexes, counts) in self._postings.items():
+            cut = bisect_left(indexes, length)
+            if cut < len(indexes):
+                del indexes[cut:]
+                del counts[cut:]
+                if not indexes:
+                    emptied.append(term)
+        for term in emptied:
+            del self._postings[term]
+        self._total_length -= sum(self._lengths[length:])
+        del self._lengths[length:]
+
+    def _index_world(self, world_state):
+        self._world_postings = {}
+        self._world_lengths = {}
+        self._world_total = 0
+        for key, value in world_state.items():
+            tokens = tokenize(world_entry_text(key, value))
+            for term in tokens:
+                entries = self._world_postings.setdefault(term, {})
+                entries[key] = entries.get(key, 0) + 1
+            self._world_lengths[key] = len(tokens)
+            self._world_total += len(tokens)
+
+    def clear(self):
+        self.__init__()
+
+    """---------"""
+    """Searching"""
+    """---------"""
+
+    def search(self, query, k=5, before=None):
+        """
+        The k best matches for a query, best first, as (score, source, key) where source is
+        HISTORY (key is the event index) or WORLD (key is the world_state key).
+        Only events before index `before` are considered (e.g. to leave out the recent ones).
+        """
+        if self._warming is not None:
+            self._finish_warming()
+        documents = len(self)
+        terms = set(tokenize(query))
+        if not documents or not terms:
+            return []
+
+        average_length = (self._total_length + self._world_total) / documents
+        frequencies = {term: self._document_frequency(term) for term in terms}
+        frequencies = {term: df for term, df in frequencies.items() if df}
+        if not frequencies:
+            return []
+        rare = {term: df for term, df in frequencies.items() if df <= documents * COMMON_RATIO}
+        if rare:
+            frequencies = rare
+
+        end = len(self._lengths) if before is None else max(0, min(before, len(self._lengths)))
+        per_term = max(MIN_POSTINGS, SCAN_BUDGET // len(frequencies))
+        # BM25 length normalisation, K1 * (1 - B + B * length / average), split into two terms
+        base = K1 * (1 - B)
+        scale = K1 * B / average_length
+        lengths = self._lengths
+        event_scores = {}
+        world_scores = {}
+        for term, df in frequencies.items():
+            weight = math.log(1 + (documents - df + 0.5) / (df + 0.5)) * (K1 + 1)
+
+            postings = self._postings.get(term)
+            if postings is not None:
+                indexes, counts = postings
+                stop = bisect_left(indexes, end)
+                for i in range(max(0, stop - per_term), stop):
+                    index = indexes[i]
+                    count = counts[i]
+                    event_scores[index] = (event_scores.get(index, 0.0) +
+                                           weight * count / (count + base + scale * lengths[index]))
+
+            for key, count in self._world_postings.get(term, {}).items():
+                world_scores[key] = (world_scores.get(key, 0.0) +
+                                     weight * count / (count + base + scale * self._world_lengths[key]))
+
+        best = heapq.nlargest(k, [(score, HISTORY, index) for index, score in event_scores.items()] +
+                              [(score, WORLD, key) for key, score in world_scores.items()],
+                              key=lambda match: match[0])
+        return best
+
+    def _document_frequency(self, term):
+        postings = self._postings.get(term)
+        return (len(postings[0]) if postings else 0) + len(self._world_postings.get(term, ()))
@@ -0,0 +1,71 @@
+import json
+import struct
+import zlib
+
+from .history import HistoryStore, compress_history
+
+# File layout:
+#   PREAMBLE   magic, format version, length of the compressed header
+#   header     zlib-compressed JSON: session, player, location, quests, world state,
+#              and the (event count, length) of every history chunk
+#   chunks     zlib-compressed history chunks, back to back
+MAGIC = b'DNDSAVE\x00'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sHI')
+
+SAVE_EXTENSION = ".sav"
+
+
+def encode_state(state):
+    """
+    JSON text of a save's state fields. Encode it when saving, so changes made while the save
+    is still queued don't leak in; encode_save takes it in place of the dict.
+    """
+    return json.dumps(state, separators=(',', ':'))
+
+
+def encode_save(state, history):
+    """Bytes of a save file for a dict of state fields (or encode_state() text) plus the history sequence"""
+    if isinstance(state, dict):
+        state = encode_state(state)
+    chunks = compress_history(history)
+    # The chunk table goes at the end of the header object
+    chunk_table = json.dumps([[count, len(data)] for count, data in chunks], separators=(',', ':'))
+    header = f"{state[:-1]}{',' if state != '{}' else ''}\"history_chunks\":{chunk_table}}}"
+    header_bytes = zlib.compress(header.encode('utf-8'))
+    return b''.join([PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)), header_bytes] +
+                    [data for _, data in chunks])
+
+
+def is_save_file(path):
+    """True for the compressed format (older saves are plain JSON)"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def open_save(path):
+    """
+    Read a save's header and return (state dict, HistoryStore).
+    Only the preamble and the header are read; history chunks are decoded on demand.
+    """
+    f = open(path, 'rb')
+    try:
+        magic, version, header_length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a save file")
+        if version > VERSION:
+            raise ValueError(f"{path} uses save format {version}; this version reads up to {VERSION}")
+        state = json.loads(zlib.decompress(f.read(header_length)).decode('utf-8'))
+    except BaseException:
+        f.close()
+        raise
+
+    offset = PREAMBLE.size + header_length
+    chunks = []
+    for count, length in state.pop('history_chunks', []):
+        chunks.append((count, offset, length))
+        offset += length
+    if not chunks:
+        f.close()
+        return state, HistoryStore()
+    return state, HistoryStore.from_chunks(f, chunks)
@@ -0,0 +1,182 @@
+import atexit
+import os
+import threading
+from collections import deque
+
+# Kinds of queued writes
+APPEND = 'append'  # Add to the end of the file
+CALL = 'call'  # Run a function on the writer thread (e.g. a database transaction)
+
+
+def _fsync_directory(directory):
+    """Make a rename durable (not possible on every platform, e.g. Windows)"""
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, data):
+    """
+    Replace a file so that a crash leaves either the old or the new contents, never a mix:
+    write a temp file next to it, fsync, then rename over the original.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def append_durable(path, data):
+    """Append to a file and fsync it (a crash can only tear the last record)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class SaveWriter:
+    """
+    Background thread that does the disk I/O for saves, in the order they were requested.
+    Consecutive appends to a file that are still waiting are merged into one write; anything
+    else (e.g. a snapshot that calls write_atomic) is submitted as a function to run.
+    Call flush() to wait until everything is on disk.
+    """
+
+    def __init__(self):
+        self._queue = deque()  # [kind, path, bytearray]
+        self._condition = threading.Condition()
+        self._busy = False
+        self._thread = None
+        self._closed = False
+        self.errors = []  # (path, exception) for writes that failed since the last flush
+
+    def append(self, path, data):
+        """Queue data to be appended to path"""
+        with self._condition:
+            self._check_open()
+            last = self._queue[-1] if self._queue else None
+            if last is not None and last[0] == APPEND and last[1] == path:
+                last[2] += _to_bytes(data)
+            else:
+                self._queue.append([APPEND, path, bytearray(_to_bytes(data))])
+            self._wake()
+
+    def submit(self, function, *args):
+        """Queue function(*args) to run on the writer thread, in order with the file writes"""
+        with self._condition:
+            self._check_open()
+            self._queue.append([CALL, None, (function, args)])
+            self._wake()
+
+    @property
+    def pending(self):
+        """Writes queued or in progress"""
+        with self._condition:
+            return len(self._queue) + (1 if self._busy else 0)
+
+    def wait(self, timeout=None):
+        """
+        Block until every queued write is done, leaving any errors for flush() to report
+        (e.g. before reading files back). Returns False if the timeout ran out.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued write is durable on disk.
+        Returns False (after printing them) if any write failed or the timeout ran out.
+        """
+        done = self.wait(timeout)
+        with self._condition:
+            errors, self.errors = self.errors, []
+
+        for path, error in errors:
+            print(f"Error saving {path}: {error}")
+        return done and not errors
+
+    def close(self, timeout=None):
+        """Flush and stop the writer thread"""
+        flushed = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return flushed
+
+    def _check_open(self):
+        if self._closed:
+            raise ValueError("SaveWriter is closed")
+
+    def _wake(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+            self._thread.start()
+        self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return
+                kind, path, data = self._queue.popleft()
+                self._busy = True
+
+            try:
+                if kind == CALL:
+                    function, args = data
+                    function(*args)
+                else:
+                    append_durable(path, bytes(data))
+            except Exception as e:
+                if kind == CALL:
+                    # Calls made for a save pass its target first
+                    function, args = data
+                    path = args[0] if args and isinstance(args[0], str) else getattr(function, '__name__', 'save')
+                with self._condition:
+                    self.errors.append((path, e))
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+
+def _to_bytes(data):
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+
+_default_writer = None
+_default_lock = threading.Lock()
+
+
+def default_writer():
+    """Writer shared by every GameState, flushed when the interpreter exits"""
+    global _default_writer
+    with _default_lock:
+        if _default_writer is None:
+            _default_writer = SaveWriter()
+            atexit.register(_default_writer.close)
+        return _default_writer
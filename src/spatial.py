@@ -0,0 +1,132 @@
+from math import floor, hypot
+
+# One 5 ft square per cell, the usual battle map grid
+DEFAULT_CELL_SIZE = 5
+
+
+class SpatialGrid:
+    """
+    Uniform grid index of positions (in feet) on the battlefield.
+    Each cell holds the keys standing in it, so range queries only look at the cells the
+    area overlaps instead of every creature, and moves only touch the two cells involved.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}  # (cell x, cell y) -> set of keys
+        self._positions = {}  # key -> (x, y)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def _cell(self, x, y):
+        return floor(x / self.cell_size), floor(y / self.cell_size)
+
+    def position(self, key):
+        return self._positions.get(key)
+
+    def place(self, key, x, y):
+        """Put a key at (x, y), moving it if it is already on the grid"""
+        old = self._positions.get(key)
+        self._positions[key] = (x, y)
+        cell = self._cell(x, y)
+        if old is not None:
+            old_cell = self._cell(*old)
+            if old_cell == cell:
+                return
+            self._discard(old_cell, key)
+        self._cells.setdefault(cell, set()).add(key)
+
+    move = place
+
+    def remove(self, key):
+        position = self._positions.pop(key, None)
+        if position is not None:
+            self._discard(self._cell(*position), key)
+
+    def _discard(self, cell, key):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._cells[cell]
+
+    def _candidates(self, min_x, min_y, max_x, max_y):
+        """Keys in every cell overlapping the bounding box"""
+        low_x, low_y = self._cell(min_x, min_y)
+        high_x, high_y = self._cell(max_x, max_y)
+        cells = self._cells
+
+        # Small areas scan their cells; areas bigger than the occupied map scan occupied cells
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > len(cells):
+            for (cx, cy), members in cells.items():
+                if low_x <= cx <= high_x and low_y <= cy <= high_y:
+                    yield from members
+            return
+
+        for cx in range(low_x, high_x + 1):
+            for cy in range(low_y, high_y + 1):
+                members = cells.get((cx, cy))
+                if members:
+                    yield from members
+
+    def within_radius(self, x, y, radius):
+        """Keys within `radius` feet of (x, y), e.g. a fireball's 20 ft sphere"""
+        positions = self._positions
+        limit = radius * radius
+        found = []
+        for key in self._candidates(x - radius, y - radius, x + radius, y + radius):
+            px, py = positions[key]
+            if (px - x) ** 2 + (py - y) ** 2 <= limit:
+                found.append(key)
+        return found
+
+    def in_line(self, start_x, start_y, end_x, end_y, width=5):
+        """Keys inside a line area from start to end, `width` feet wide (e.g. lightning bolt)"""
+        length = hypot(end_x - start_x, end_y - start_y)
+        if length == 0:
+            return self.within_radius(start_x, start_y, width / 2)
+
+        half = width / 2
+        dir_x = (end_x - start_x) / length
+        dir_y = (end_y - start_y) / length
+        positions = self._positions
+        found = []
+        box = (min(start_x, end_x) - half, min(start_y, end_y) - half,
+               max(start_x, end_x) + half, max(start_y, end_y) + half)
+        for key in self._candidates(*box):
+            px, py = positions[key]
+            along = (px - start_x) * dir_x + (py - start_y) * dir_y
+            across = abs((py - start_y) * dir_x - (px - start_x) * dir_y)
+            if 0 <= along <= length and across <= half:
+                found.append(key)
+        return found
+
+    def in_cone(self, origin_x, origin_y, toward_x, toward_y, length):
+        """
+        Keys inside a cone starting at the origin and aimed at (toward_x, toward_y).
+        As in 5e, the cone's width at any distance equals that distance from the origin.
+        """
+        distance = hypot(toward_x - origin_x, toward_y - origin_y)
+        if distance == 0:
+            return []
+
+        dir_x = (toward_x - origin_x) / distance
+        dir_y = (toward_y - origin_y) / distance
+        half = length / 2
+        # Bounding box of the triangle: origin plus the two far corners
+        corners_x = (origin_x, origin_x + dir_x * length - dir_y * half, origin_x + dir_x * length + dir_y * half)
+        corners_y = (origin_y, origin_y + dir_y * length + dir_x * half, origin_y + dir_y * length - dir_x * half)
+
+        positions = self._positions
+        found = []
+        for key in self._candidates(min(corners_x), min(corners_y), max(corners_x), max(corners_y)):
+            px, py = positions[key]
+            along = (px - origin_x) * dir_x + (py - origin_y) * dir_y
+            across = abs((py - origin_y) * dir_x - (px - origin_x) * dir_y)
+            if 0 < along <= length and across <= along / 2:
+                found.append(key)
+        return found
@@ -0,0 +1,418 @@
+import json
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+
+from .history import HistoryStore
+from .save_format import SAVE_EXTENSION, encode_save, encode_state, is_save_file, open_save
+from .save_writer import default_writer, write_atomic
+
+SAVE_DIR = "saves"
+
+# Journal records written before FileStorage folds them into a new snapshot
+COMPACT_AFTER_RECORDS = 1000
+
+# Errors that mean a save exists but can't be read
+READ_ERRORS = (json.JSONDecodeError, UnicodeDecodeError, ValueError, struct.error, zlib.error, sqlite3.Error)
+
+
+def _journal_path(filename):
+    """Journal of changes since the snapshot, next to it: saves/x.sav -> saves/x.journal"""
+    return os.path.splitext(filename)[0] + ".journal"
+
+
+def compact_json(value):
+    """JSON without spaces (storage rows and journal records; GameState compares saves with it too)"""
+    return json.dumps(value, separators=(',', ':'))
+
+
+def _summary(session_id, player, location, last_saved):
+    """One row of the save catalog"""
+    player = player or {}
+    return {
+        'session_id': session_id,
+        'character_name': player.get('name', ''),
+        'level': player.get('level', 1),
+        'race': player.get('race', ''),
+        'character_class': player.get('character_class', ''),
+        'location': location,
+        'last_saved': last_saved
+    }
+
+
+class FileStorage:
+    """
+    Saves as files in a directory: a compressed snapshot per session (see save_format.py)
+    plus a journal of the changes made since, written by the background SaveWriter.
+
+    Every backend offers the same calls to GameState:
+      default_target(session_id), save(target, state, history, changes), load(target),
+      list_sessions(), latest_session(), history(target, start, stop, event_type), flush()
+    `state` holds the saved fields plus world_state; `changes` (None for a full save) holds
+    the new history events and the fields/world_state keys that changed since the last save.
+    """
+
+    def __init__(self, directory=SAVE_DIR, writer=None):
+        self.directory = directory
+        self.writer = writer if writer is not None else default_writer()
+        self._generations = {}  # target -> generation of the latest snapshot (on disk or queued)
+        self._journal_records = {}  # target -> records journaled since that snapshot
+        self._failed = set()  # Targets whose last snapshot couldn't be written
+        self._lock = threading.Lock()
+
+    def default_target(self, session_id):
+        return os.path.join(self.directory, f"{session_id}{SAVE_EXTENSION}")
+
+    def flush(self, timeout=None):
+        return self.writer.flush(timeout)
+
+    def save(self, target, state, history, changes=None):
+        with self._lock:
+            retry = target in self._failed  # Cleared once a full snapshot lands
+        if (changes is None or retry or target not in self._generations
+                or self._journal_records[target] >= COMPACT_AFTER_RECORDS):
+            self._write_snapshot(target, state, history)
+        else:
+            self._append_journal(target, changes)
+
+    def _write_snapshot(self, target, state, history):
+        """
+        Queue a snapshot. Only the state's JSON is built here; reading and compressing the
+        history and all the disk I/O happen on the writer thread.
+        """
+        generation = self._generations.get(target, 0) + 1
+        save_data = dict(state)
+        save_data['generation'] = generation
+        header = encode_state(save_data)
+        history = history.save_view() if isinstance(history, HistoryStore) else list(history)
+
+        with self._lock:
+            self._generations[target] = generation
+        self._journal_records[target] = 0
+        self.writer.submit(self._commit_snapshot, target, generation, header, history)
+
+    def _commit_snapshot(self, target, generation, header, history):
+        """
+        Runs on the writer thread. The journal is only reset once the new snapshot is in place:
+        if writing it fails, the old snapshot and journal stay as they were (records tagged with
+        the new generation are ignored when loading) and the next save is a full one.
+        """
+        with self._lock:
+            if generation != self._generations.get(target):
+                return  # A newer snapshot is queued and supersedes this one
+        try:
+            # History chunks already compressed in the old save are copied over as they are
+            write_atomic(target, encode_save(header, history))
+        except Exception:
+            with self._lock:
+                self._failed.add(target)
+            raise
+        # Records of older generations are already in the snapshot; start the journal over
+        write_atomic(_journal_path(target), b'')
+        with self._lock:
+            self._failed.discard(target)
+
+    def _append_journal(self, target, changes):
+        """Append a record for every new history event and every changed field or world_state key"""
+        generation = self._generations[target]
+        records = [{'g': generation, 't': 'event', 'e': event} for event in changes['events']]
+        records += [{'g': generation, 't': 'set', 'k': field, 'v': value} for field, value in changes['fields'].items()]
+        records += [{'g': generation, 't': 'world', 'k': key, 'v': value} for key, value in changes['world'].items()]
+        records += [{'g': generation, 't': 'world_del', 'k': key} for key in changes['world_deleted']]
+
+        if records:
+            self.writer.append(_journal_path(target), ''.join(compact_json(record) + '\n' for record in records))
+        self._journal_records[target] += len(records)
+
+    def load(self, target):
+        """
+        (state dict, history) for a save: the snapshot, then its journal.
+        Compressed saves only read their header up front; history is decoded when it is used.
+        Older plain JSON saves still load.
+        """
+        state, history, generation, applied = self._read(target)
+        with self._lock:
+            self._generations[target] = generation
+        self._journal_records[target] = applied
+        return state, history
+
+    def _read(self, target):
+        """
+        (state, history, snapshot generation, journal records applied) for a save.
+        Only reads: the catalog and history lookups use it too, without touching what
+        load() tracks for the next save.
+        """
+        # Saves still queued in this process must land before the files are read
+        # (their errors are left for the game's own flush to report)
+        self.writer.wait()
+        if is_save_file(target):
+            state, history = open_save(target)
+        else:
+            with open(target, 'r') as f:
+                state = json.load(f)
+            history = state.pop('history', [])
+
+        generation = state.get('generation', 0)  # Older saves have no journal
+        state.setdefault('world_state', {})
+        applied = self._replay_journal(target, generation, state, history)
+        return state, history, generation, applied
+
+    def _replay_journal(self, target, generation, state, history):
+        """Apply the journal records written since the snapshot; returns how many were applied"""
+        path = _journal_path(target)
+        if not os.path.exists(path):
+            return 0
+
+        applied = 0
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A torn last record from a crash mid-append
+                if record.get('g') != generation:
+                    continue  # Left over from before the last compaction
+
+                kind = record.get('t')
+                if kind == 'event':
+                    history.append(record['e'])
+                elif kind == 'set':
+                    state[record['k']] = record['v']
+                elif kind == 'world':
+                    state['world_state'][record['k']] = record['v']
+                elif kind == 'world_del':
+                    state['world_state'].pop(record['k'], None)
+                applied += 1
+        return applied
+
+    def _save_files(self):
+        if not os.path.exists(self.directory):
+            return []
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                if name.endswith((SAVE_EXTENSION, ".json"))]
+
+    def list_sessions(self):
+        """Catalog of saves, newest first (reads each save's header)"""
+        self.writer.wait()
+        sessions = []
+        for path in self._save_files():
+            try:
+                state, _, _, _ = self._read(path)
+            except READ_ERRORS + (OSError,):
+                continue
+            summary = _summary(state.get('session_id', ''), state.get('player'),
+                               state.get('current_location', ''), state.get('last_saved'))
+            summary['target'] = path
+            sessions.append(summary)
+        sessions.sort(key=lambda summary: summary['last_saved'] or '', reverse=True)
+        return sessions
+
+    def latest_session(self):
+        """Target of the most recently written save, or None"""
+        self.writer.wait()
+        files = self._save_files()
+        return max(files, key=self._modified) if files else None
+
+    def _modified(self, path):
+        """Last write to a save, counting its journal"""
+        journal = _journal_path(path)
+        modified = os.path.getmtime(path)
+        return max(modified, os.path.getmtime(journal)) if os.path.exists(journal) else modified
+
+    def history(self, target, start=0, stop=None, event_type=None):
+        """Events start..stop of a save, optionally only one event type"""
+        _, history, _, _ = self._read(target)
+        events = history[start:stop]
+        if event_type is not None:
+            events = [event for event in events if event.get('type') == event_type]
+        return events
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    character_name TEXT,
+    level INTEGER,
+    race TEXT,
+    character_class TEXT,
+    location TEXT,
+    last_saved TEXT,
+    player TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_by_last_saved ON sessions (last_saved);
+CREATE INDEX IF NOT EXISTS sessions_by_character ON sessions (character_name);
+
+CREATE TABLE IF NOT EXISTS history (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    timestamp TEXT,
+    type TEXT,
+    description TEXT,
+    event TEXT,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS history_by_type ON history (session_id, type, seq);
+
+CREATE TABLE IF NOT EXISTS quests (
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    quest TEXT,
+    PRIMARY KEY (session_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS world_state (
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (session_id, key)
+) WITHOUT ROWID;
+"""
+
+def _event_row(session_id, seq, event):
+    return (session_id, seq, event.get('timestamp'), event.get('type'), event.get('description'),
+            compact_json(event))
+
+
+class SQLiteStorage:
+    """
+    Saves in one SQLite database: sessions, history, quests and world state in indexed tables.
+    Each save is one transaction run on the background SaveWriter; the rows are built on
+    the caller's thread so the game can keep changing its state meanwhile. The save list,
+    the latest session and history ranges are all index lookups.
+    """
+
+    def __init__(self, path=os.path.join(SAVE_DIR, "saves.db"), writer=None):
+        self.path = path
+        self.writer = writer if writer is not None else default_writer()
+        self._connection = None
+        self._lock = threading.Lock()
+        self._history_lengths = {}  # session id -> events stored
+
+    def default_target(self, session_id):
+        return session_id
+
+    def flush(self, timeout=None):
+        return self.writer.flush(timeout)
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        self.writer.flush()
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def save(self, target, state, history, changes=None):
+        if changes is None:
+            events = list(history)
+            start = 0
+            full = True
+        else:
+            events = changes['events']
+            start = self._history_lengths.get(target)
+            full = start is None
+            if full:
+                events = list(history)
+                start = 0
+        self._history_lengths[target] = start + len(events)
+
+        session = _summary(target, state.get('player'), state.get('current_location', ''), state.get('last_saved'))
+        session_row = (target, session['character_name'], session['level'], session['race'],
+                       session['character_class'], session['location'], session['last_saved'],
+                       compact_json(state.get('player')))
+        history_rows = [_event_row(target, start + i, event) for i, event in enumerate(events)]
+
+        if full:
+            world = {key: compact_json(value) for key, value in state.get('world_state', {}).items()}
+            world_deleted = None
+            quests = state.get('quests', [])
+        else:
+            world = {key: compact_json(value) for key, value in changes['world'].items()}
+            world_deleted = list(changes['world_deleted'])
+            quests = changes['fields'].get('quests')
+        quest_rows = None if quests is None else [(target, i, compact_json(quest)) for i, quest in enumerate(quests)]
+
+        self.writer.submit(self._write, target, full, session_row, history_rows, world, world_deleted, quest_rows)
+
+    def _write(self, target, full, session_row, history_rows, world, world_deleted, quest_rows):
+        with self._lock:
+            connection = self._connect()
+            with connection:  # One transaction: all of it lands or none of it does
+                if full:
+                    for table in ('history', 'quests', 'world_state'):
+                        connection.execute(f"DELETE FROM {table} WHERE session_id = ?", (target,))
+                connection.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", session_row)
+                connection.executemany("INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?)", history_rows)
+                connection.executemany("INSERT OR REPLACE INTO world_state VALUES (?, ?, ?)",
+                                       [(target, key, value) for key, value in world.items()])
+                if world_deleted:
+                    connection.executemany("DELETE FROM world_state WHERE session_id = ? AND key = ?",
+                                           [(target, key) for key in world_deleted])
+                if quest_rows is not None:
+                    connection.execute("DELETE FROM quests WHERE session_id = ?", (target,))
+                    connection.executemany("INSERT INTO quests VALUES (?, ?, ?)", quest_rows)
+
+    def _query(self, sql, parameters=()):
+        self.writer.wait()
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def load(self, target):
+        rows = self._query("SELECT location, last_saved, player FROM sessions WHERE session_id = ?", (target,))
+        if not rows:
+            raise FileNotFoundError(target)
+        location, last_saved, player = rows[0]
+
+        history = self.history(target)
+        self._history_lengths[target] = len(history)
+        state = {
+            'session_id': target,
+            'player': json.loads(player) if player else None,
+            'current_location': location,
+            'last_saved': last_saved,
+            'quests': [json.loads(quest) for (quest,) in self._query(
+                "SELECT quest FROM quests WHERE session_id = ? ORDER BY position", (target,))],
+            'world_state': {key: json.loads(value) for key, value in self._query(
+                "SELECT key, value FROM world_state WHERE session_id = ?", (target,))}
+        }
+        return state, history
+
+    def list_sessions(self):
+        """Catalog of saves, newest first"""
+        rows = self._query(
+            "SELECT session_id, character_name, level, race, character_class, location, last_saved "
+            "FROM sessions ORDER BY last_saved DESC"
+        )
+        keys = ('session_id', 'character_name', 'level', 'race', 'character_class', 'location', 'last_saved')
+        sessions = []
+        for row in rows:
+            summary = dict(zip(keys, row))
+            summary['target'] = summary['session_id']
+            sessions.append(summary)
+        return sessions
+
+    def latest_session(self):
+        rows = self._query("SELECT session_id FROM sessions ORDER BY last_saved DESC LIMIT 1")
+        return rows[0][0] if rows else None
+
+    def history(self, target, start=0, stop=None, event_type=None):
+        """Events start..stop of a session, optionally only one event type"""
+        sql = "SELECT event FROM history WHERE session_id = ? AND seq >= ?"
+        parameters = [target, start]
+        if stop is not None:
+            sql += " AND seq < ?"
+            parameters.append(stop)
+        if event_type is not None:
+            sql += " AND type = ?"
+            parameters.append(event_type)
+        return [json.loads(event) for (event,) in self._query(sql + " ORDER BY seq", parameters)]